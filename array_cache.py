@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+
+import numpy as np
+
+
+class ArrayCache:
+    """
+    A class keeps parsed text files as .npy sidecars and opens
+    them memory-mapped on later runs
+
+    A sidecar is valid while the source file keeps its full path, size
+    and modification time, all of which are encoded in the sidecar name.
+
+    ...
+    Methods
+    -------
+    load(file_name: str, parser)
+        Returns cached array of file_name or parses the file with parser
+        and caches the result
+    store(file_name: str, data)
+        Caches already known content of file_name
+    clear(file_name: str)
+        Removes all sidecars of file_name
+    """
+
+    dir_name = '.npy_cache'
+    ext = '.npy'
+
+    def __init__(self, cache_dir=None, enabled=True, rebuild=False):
+        """
+        :param cache_dir: str, directory for sidecars, by default
+            .npy_cache next to every source file
+        :param enabled: bool, if False files are always parsed and
+            nothing is written
+        :param rebuild: bool, if True existing sidecars are ignored
+            and overwritten
+        """
+
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.rebuild = rebuild
+        self.hits = 0
+        self.misses = 0
+
+    def _prefix(self, file_name):
+        file_name = os.path.abspath(file_name)
+        cache_dir = self.cache_dir or os.path.join(os.path.dirname(file_name), self.dir_name)
+        digest = hashlib.sha1(os.path.normcase(file_name).encode('utf-8')).hexdigest()[:16]
+        return cache_dir, digest
+
+    def _sidecar(self, file_name):
+        stat = os.stat(file_name)
+        cache_dir, digest = self._prefix(file_name)
+        return os.path.join(cache_dir, f'{digest}_{stat.st_size}_{stat.st_mtime_ns}{self.ext}')
+
+    def _save(self, sidecar, data):
+        with open(sidecar, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data))
+
+    def _open(self, sidecar):
+        return np.load(sidecar, mmap_mode='r')
+
+    def clear(self, file_name):
+        cache_dir, digest = self._prefix(file_name)
+        try:
+            with os.scandir(cache_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith(digest + '_') and entry.name.endswith(self.ext):
+                        os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+
+    def store(self, file_name, data):
+        """
+        :param file_name: str, source file whose content is data
+        :param data: parsed content of file_name
+        :return: str, sidecar file name or None if caching is disabled
+        """
+
+        if not self.enabled:
+            return None
+        sidecar = self._sidecar(file_name)
+        self.clear(file_name)
+        os.makedirs(os.path.dirname(sidecar), exist_ok=True)
+        tmp_file = f'{sidecar}.{os.getpid()}.tmp'
+        self._save(tmp_file, data)
+        os.replace(tmp_file, sidecar)
+        return sidecar
+
+    def load(self, file_name, parser):
+        """
+        :param file_name: str, source file
+        :param parser: callable, parser(file_name) -> data
+        :return: data, read-only memory-mapped on cache hits
+        """
+
+        if not self.enabled:
+            return parser(file_name)
+
+        sidecar = self._sidecar(file_name)
+        if not self.rebuild and os.path.isfile(sidecar):
+            try:
+                data = self._open(sidecar)
+                self.hits += 1
+                return data
+            except (ValueError, OSError):
+                pass
+
+        self.misses += 1
+        data = parser(file_name)
+        try:
+            self.store(file_name, data)
+        except (ValueError, OSError):
+            # Data which can not be kept is parsed again next time
+            pass
+        return data
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+
+from datetime import datetime
+
+import numpy as np
+
+import nxopen_stub
+
+from geometry import guide_curves, orient_sections
+from array_cache import ArrayCache
+from blade_io import SectionsCache, read_airfoil, write_airfoil_csv, write_airfoil_binary
+from get_data import invert_array, change_columns, get_unique_array, preprocess_sections
+
+
+def synthetic_section(n_points, span, seed=0):
+    """
+    Creates pressure and suction side points of an airfoil-like section
+    :param n_points: int, number of points of every side
+    :param span: float, relative span position 0..1, sets stagger and chord
+    :param seed: int, random seed of the small shape noise
+    :return: np.ndarray, np.ndarray
+        PS and SS points (n_points, 3), both from leading to trailing edge,
+        the points of the leading and trailing edges are shared
+    """
+
+    rng = np.random.default_rng(seed)
+    x = 0.5 * (1.0 - np.cos(np.linspace(0.0, np.pi, n_points)))
+    thickness = 0.6 * (0.2969 * np.sqrt(x) - 0.126 * x - 0.3516 * x ** 2 + 0.2843 * x ** 3 - 0.1036 * x ** 4)
+    thickness[-1] = 0.0
+    camber = 0.08 * np.sin(np.pi * x) * (1.0 + 0.02 * rng.standard_normal())
+
+    chord = 0.05 * (1.0 - 0.3 * span)
+    stagger = np.radians(20.0 + 30.0 * span)
+    c, s = np.cos(stagger), np.sin(stagger)
+
+    sides = []
+    for sign in (-1.0, 1.0):
+        u, v = x * chord, (camber + sign * thickness) * chord
+        sides.append(np.column_stack((c * u - s * v, s * u + c * v, np.full(n_points, 0.3 + 0.1 * span))))
+    return sides[0], sides[1]
+
+
+def synthetic_blade(n_sections, n_points, seed=0):
+    """
+    :param n_sections: int, number of sections
+    :param n_points: int, number of points of every section side
+    :param seed: int
+    :return: dict, section name -> (PS, SS) arrays
+    """
+
+    return {
+        f'section{i + 1}': synthetic_section(n_points, i / max(n_sections - 1, 1), seed + i)
+        for i in range(n_sections)
+    }
+
+
+def write_dat_files(blade, airfoil_sections_dir):
+    """
+    Writes a blade in the layout read by get_data.preprocess_sections
+    :return: None
+    """
+
+    ss_dir = os.path.join(airfoil_sections_dir, 'ss_airfoils')
+    os.makedirs(ss_dir, exist_ok=True)
+    for key, (ps, ss) in blade.items():
+        np.savetxt(os.path.join(airfoil_sections_dir, f'ps_{key}.dat'), ps, delimiter='\t')
+        np.savetxt(os.path.join(ss_dir, f'ss_{key}.dat'), ss, delimiter='\t')
+
+
+def timed(func, repeat=3):
+    """
+    :param func: callable without arguments
+    :param repeat: int, number of runs
+    :return: dict, min, median and max wall time in seconds
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {'min': min(times), 'median': statistics.median(times), 'max': max(times), 'repeat': repeat}
+
+
+def bench_preprocessing(blade, work_dir, repeat=3, tolerance=1e-9):
+    """
+    Times the get_data.py steps on one blade
+    :return: dict, step name -> timings
+    """
+
+    ss_sides = [ss for _, ss in blade.values()]
+    combined = [np.vstack((ps, ss[::-1])) for ps, ss in blade.values()]
+    swapped = [change_columns(a) for a in combined]
+    sections = {key: get_unique_array(a, tolerance) for key, a in zip(blade, swapped)}
+
+    airfoil_sections_dir = os.path.join(work_dir, 'airfoils')
+    write_dat_files(blade, airfoil_sections_dir)
+    airfoil_file = os.path.join(work_dir, 'airfoil.dat')
+    cache = ArrayCache()
+    preprocess_sections(airfoil_sections_dir, airfoil_file, cache=cache, tolerance=tolerance)
+
+    return {
+        'transform': timed(lambda: [change_columns(invert_array(a)) for a in ss_sides], repeat),
+        'combine': timed(lambda: [np.vstack((ps, invert_array(ss))) for ps, ss in blade.values()], repeat),
+        'dedup': timed(lambda: [get_unique_array(a, tolerance) for a in swapped], repeat),
+        'write_csv': timed(lambda: write_airfoil_csv(os.path.join(work_dir, 'w.csv'), sections), repeat),
+        'write_binary': timed(lambda: write_airfoil_binary(os.path.join(work_dir, 'w.blade'), sections), repeat),
+        'pipeline_cold': timed(lambda: preprocess_sections(
+            airfoil_sections_dir, airfoil_file, tolerance=tolerance), repeat),
+        'pipeline_cached': timed(lambda: preprocess_sections(
+            airfoil_sections_dir, airfoil_file, cache=cache, tolerance=tolerance), repeat),
+    }, sections
+
+
+def bench_parsing(sections, work_dir, repeat=3):
+    """
+    Times the nx_main.py airfoil loading from every supported source
+    :return: dict, source -> timings
+    """
+
+    csv_file = os.path.join(work_dir, 'parse.csv')
+    blade_file = os.path.join(work_dir, 'parse.blade')
+    write_airfoil_csv(csv_file, sections)
+    write_airfoil_binary(blade_file, sections)
+    cache = SectionsCache()
+    read_airfoil(csv_file, cache)
+
+    return {
+        'csv': timed(lambda: read_airfoil(csv_file), repeat),
+        'csv_cached': timed(lambda: read_airfoil(csv_file, cache), repeat),
+        'binary': timed(lambda: read_airfoil(blade_file), repeat),
+    }
+
+
+def bench_nx(sections, n_blades, work_dir, latency=0.0):
+    """
+    Builds one row of blades with the NX wrapper against the stand-in
+    backend, times every step and counts NX API calls
+    :return: dict, step -> {'time': seconds, 'nx_calls': int}
+    """
+
+    from nx_class import NX
+    from nx_main import create_assembly
+
+    stats = nxopen_stub.install(latency)
+    nxopen_stub.reset()
+    results = {}
+
+    def step(name, func):
+        calls = stats.total
+        start = time.perf_counter()
+        func()
+        entry = results.setdefault(name, {'time': 0.0, 'nx_calls': 0})
+        entry['time'] += time.perf_counter() - start
+        entry['nx_calls'] += stats.total - calls
+
+    prt_dir = os.path.join(work_dir, 'nx', 'prt')
+    os.makedirs(prt_dir, exist_ok=True)
+    points, _ = orient_sections(list(sections.values()))
+    sections = dict(zip(sections, points))
+    guides, section_help_points, guide_help_points = guide_curves(points)
+
+    nx = NX()
+    parts = []
+    for b in range(n_blades):
+        part = os.path.join(prt_dir, f'blade{b}.prt')
+        parts.append(part)
+        tags, guide_tags = {}, {}
+        step('create_new_nx_file', lambda: nx.create_new_nx_file(file_name=part))
+        for key, val in sections.items():
+            step('create_spline_with_points', lambda: tags.update(
+                {key: nx.create_spline_with_points(points=val, degree=2, coeff=1000, name=key)[0]}))
+        for i, guide in enumerate(guides):
+            step('create_spline_with_points', lambda: guide_tags.update(
+                {i: nx.create_spline_with_points(points=guide, degree=2, coeff=1000, closed_spline=False)[0]}))
+        step('swept', lambda: nx.swept(
+            sections=tags, guides=guide_tags,
+            section_help_points=section_help_points * 1000,
+            guide_help_points=guide_help_points * 1000))
+        step('close_all', lambda: nx.close_all(part))
+
+    assembly_file = os.path.join(work_dir, 'nx', 'assembly.prt')
+    step('create_new_nx_file', lambda: nx.create_new_nx_file(file_name=assembly_file))
+    for part in parts:
+        step('add_part_to_assembly', lambda: nx.add_part_to_assembly(part, assembly_file))
+    step('close_all', lambda: nx.close_all(assembly_file))
+
+    batch_file = os.path.join(work_dir, 'nx', 'assembly_batch.prt')
+    step('create_new_nx_file', lambda: nx.create_new_nx_file(file_name=batch_file))
+    step('add_parts_to_assembly', lambda: nx.add_parts_to_assembly(parts, batch_file))
+    step('close_all', lambda: nx.close_all(batch_file))
+
+    # Whole create_assembly run on the same row
+    root_dir = os.path.join(work_dir, 'assembly')
+    airfoils_dir = os.path.join(root_dir, 'gte', 'airfoils')
+    os.makedirs(airfoils_dir, exist_ok=True)
+    for b in range(n_blades):
+        write_airfoil_csv(os.path.join(airfoils_dir, f'blade{b}.csv'), sections)
+    step('create_assembly', lambda: create_assembly(root_dir, os.path.join(root_dir, 'gte'), coeff=1000))
+
+    # Run again with one changed blade, only its part is built again in
+    # place of the stale one
+    changed = {key: val * 1.01 for key, val in sections.items()}
+    write_airfoil_csv(os.path.join(airfoils_dir, 'blade0.csv'), changed)
+    part = os.path.join(root_dir, 'prt', 'blade0.prt')
+    mtime_ns = os.stat(part).st_mtime_ns
+    step('create_assembly_rebuild', lambda: create_assembly(root_dir, os.path.join(root_dir, 'gte'), coeff=1000))
+    if os.stat(part).st_mtime_ns == mtime_ns:
+        raise RuntimeError(f"Changed blade part '{part}' has not been rebuilt.")
+
+    # create_assembly attaches a file handler to the root logger,
+    # close it before the temporary directory is removed
+    for handler in logging.getLogger().handlers[:]:
+        handler.close()
+        logging.getLogger().removeHandler(handler)
+    return results
+
+
+def run_case(n_sections, n_points, n_blades, repeat=3, latency=0.0, seed=0):
+    """
+    :return: dict, parameters and timings of one case
+    """
+
+    blade = synthetic_blade(n_sections, n_points, seed)
+    work_dir = tempfile.mkdtemp(prefix='nx_bench_')
+    try:
+        preprocessing, sections = bench_preprocessing(blade, work_dir, repeat)
+        return {
+            'sections': n_sections,
+            'points_per_section': n_points,
+            'blades_per_row': n_blades,
+            'total_points': int(sum(len(v) for v in sections.values())) * n_blades,
+            'get_data': preprocessing,
+            'parsing': bench_parsing(sections, work_dir, repeat),
+            'nx': bench_nx(sections, n_blades, work_dir, latency),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Benchmark blade preprocessing and NX assembly build')
+    parser.add_argument('--sections', type=_int_list, default=[10], help='sections per blade, comma separated')
+    parser.add_argument('--points', type=_int_list, default=[200], help='points per section side, comma separated')
+    parser.add_argument('--blades', type=_int_list, default=[4], help='blades per row, comma separated')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of every timed step')
+    parser.add_argument('--latency', type=float, default=0.0, help='simulated NX API call latency, seconds')
+    parser.add_argument('--output', default=None, help='JSON file, results are printed if not set')
+    args = parser.parse_args()
+
+    nxopen_stub.install(args.latency)
+
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'latency': args.latency,
+        'cases': [
+            run_case(s, p, b, args.repeat, args.latency)
+            for s in args.sections for p in args.points for b in args.blades
+        ]
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+
+import os
+import re
+
+import numpy as np
+
+from array_cache import ArrayCache
+
+
+BLADE_EXT = '.blade'
+BLADE_MAGIC = b'NXBLADE\x01'
+BLADE_TABLE = np.dtype([('name', 'S32'), ('offset', '<u8'), ('count', '<u8')])
+
+SECTION_HEADER = re.compile(r'section(\d+)\b')
+
+
+def write_airfoil_csv(file_name, sections):
+    """
+    Writes sections as text, a 'sectionN,,' line followed by the section points
+    :param file_name: str, output file
+    :param sections: dict, section name -> (N, 3) array
+    :return: None
+    """
+
+    with open(file_name, 'w') as f:
+        for key, val in sections.items():
+            f.write(f'{key},,\n')
+            np.savetxt(f, val, delimiter=',')
+
+
+def write_airfoil_binary(file_name, sections):
+    """
+    Writes sections to a flat binary file
+
+    Layout: 8 bytes magic, uint64 number of sections, a table of
+    (name, first point, number of points) records and all points as
+    one contiguous little-endian float64 (N, 3) block. Names are at
+    most 32 bytes, a longer one raises ValueError.
+
+    :param file_name: str, output file
+    :param sections: dict, section name -> (N, 3) array
+    :return: None
+    """
+
+    table = np.zeros(len(sections), dtype=BLADE_TABLE)
+    offset = 0
+    for i, (key, val) in enumerate(sections.items()):
+        name = key.encode('utf-8')
+        if len(name) > BLADE_TABLE['name'].itemsize:
+            raise ValueError(f"Section name '{key}' is longer than {BLADE_TABLE['name'].itemsize} bytes.")
+        table[i] = (name, offset, len(val))
+        offset += len(val)
+
+    tmp_file = f'{file_name}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(BLADE_MAGIC)
+        f.write(np.uint64(len(table)).astype('<u8').tobytes())
+        f.write(table.tobytes())
+        for val in sections.values():
+            f.write(np.ascontiguousarray(val, dtype='<f8').reshape(-1, 3).tobytes())
+    os.replace(tmp_file, file_name)
+
+
+def read_airfoil_binary(file_name):
+    """
+    Maps a file written by write_airfoil_binary without copying the points
+    :param file_name: str, input file
+    :return: dict, section name -> read-only (N, 3) view of the file
+    """
+
+    with open(file_name, 'rb') as f:
+        if f.read(len(BLADE_MAGIC)) != BLADE_MAGIC:
+            raise ValueError(f"File '{file_name}' is not a blade geometry file.")
+        n_sections = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+        table = np.frombuffer(f.read(n_sections * BLADE_TABLE.itemsize), dtype=BLADE_TABLE)
+
+    data_offset = len(BLADE_MAGIC) + 8 + table.nbytes
+    total = int(table['count'].sum()) if n_sections else 0
+    if not total:
+        return {name.decode('utf-8'): np.empty((0, 3)) for name in table['name']}
+
+    points = np.memmap(file_name, dtype='<f8', mode='r', offset=data_offset, shape=(total, 3))
+    return {
+        name.decode('utf-8'): points[offset:offset + count]
+        for name, offset, count in table.tolist()
+    }
+
+
+def parse_airfoil_csv(file_name):
+    """
+    Parses sections written by write_airfoil_csv in one pass
+    :param file_name: str, input file
+    :return: np.ndarray, list, np.ndarray
+        All points as one contiguous float64 (N, 3) array, section names
+        in file order and section offsets, points of section i are
+        points[offsets[i]:offsets[i + 1]]
+    """
+
+    with open(file_name, 'r') as f:
+        text = f.read()
+
+    # Header lines: (start, end) of every line starting with 'section'
+    headers = []
+    start = text.find('section')
+    while start != -1:
+        if start and text[start - 1] != '\n':
+            start = text.find('section', start + 1)
+            continue
+        end = text.find('\n', start)
+        end = len(text) if end == -1 else end
+        headers.append((start, end))
+        start = text.find('section', end)
+
+    if not headers:
+        raise ValueError(f"File '{file_name}' has no section header lines.")
+    if text[:headers[0][0]].strip():
+        raise ValueError(f"File '{file_name}' has points before the first section header.")
+
+    names = []
+    for start, end in headers:
+        match = SECTION_HEADER.match(text, start, end)
+        if not match:
+            raise ValueError(f"Wrong section header '{text[start:end]}' in '{file_name}'.")
+        names.append(match.group(0))
+    if len(set(names)) != len(names):
+        raise ValueError(f"File '{file_name}' has repeated section names.")
+
+    # Point lines of all sections are joined and parsed at once
+    blocks = [
+        text[end + 1:next_start]
+        for (_, end), next_start in zip(headers, [h[0] for h in headers[1:]] + [len(text)])
+    ]
+    blocks = [block.strip() for block in blocks]
+    counts = np.array([block.count('\n') + 1 if block else 0 for block in blocks])
+    numbers = ','.join(block for block in blocks if block).replace('\n', ',')
+    points = np.fromstring(numbers, sep=',') if numbers else np.empty(0)
+
+    if len(points) != 3 * counts.sum():
+        raise ValueError(f"File '{file_name}' has blank or incomplete point lines.")
+
+    offsets = np.zeros(len(names) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return points.reshape(-1, 3), names, offsets
+
+
+class SectionsCache(ArrayCache):
+    """
+    A class keeps parsed sections files as .blade sidecars, so
+    unchanged files are mapped instead of parsed
+    """
+
+    ext = BLADE_EXT
+
+    def _save(self, sidecar, data):
+        write_airfoil_binary(sidecar, data)
+
+    def _open(self, sidecar):
+        return read_airfoil_binary(sidecar)
+
+
+def read_airfoil_csv(file_name, cache=None):
+    """
+    Reads sections written by write_airfoil_csv
+    :param file_name: str, input file
+    :param cache: SectionsCache, if set unchanged files are memory-mapped
+        from the binary sidecar instead of parsed
+    :return: dict, section name -> (N, 3) view of one contiguous array
+    """
+
+    def parser(name):
+        points, names, offsets = parse_airfoil_csv(name)
+        return {key: points[offsets[i]:offsets[i + 1]] for i, key in enumerate(names)}
+
+    if cache:
+        return cache.load(file_name, parser)
+    return parser(file_name)
+
+
+def sort_sections(airfoil):
+    """
+    Orders sections by their number, gaps in numbering are allowed,
+    sections without a number keep their order after numbered ones
+    :param airfoil: dict, section name -> points
+    :return: dict
+    """
+
+    def number(item):
+        match = SECTION_HEADER.fullmatch(item[0])
+        return (0, int(match[1])) if match else (1, 0)
+
+    return dict(sorted(airfoil.items(), key=number))
+
+
+def read_airfoil(file_name, cache=None):
+    """
+    Reads blade sections from the binary container or from CSV text
+    :param file_name: str, .blade or .csv file
+    :param cache: SectionsCache for CSV files
+    :return: dict, section name -> points, ordered by section number
+    """
+
+    if os.path.splitext(file_name)[1] == BLADE_EXT:
+        return sort_sections(read_airfoil_binary(file_name))
+    return sort_sections(read_airfoil_csv(file_name, cache))
+
+
+def prefer_binary(files):
+    """
+    Drops text files that have a binary container with the same name
+    which is at least as new, otherwise the outdated binary file
+    :param files: list of .blade and .csv file names
+    :return: list of file names
+    """
+
+    def mtime(file_name):
+        try:
+            return os.stat(file_name).st_mtime_ns
+        except OSError:
+            return -1
+
+    texts = {os.path.splitext(f)[0]: f for f in files if os.path.splitext(f)[1] != BLADE_EXT}
+    dropped = set()
+    for f in files:
+        stem = os.path.splitext(f)[0]
+        if os.path.splitext(f)[1] == BLADE_EXT and stem in texts:
+            dropped.add(texts[stem] if mtime(f) >= mtime(texts[stem]) else f)
+    return [f for f in files if f not in dropped]
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import nxopen_stub
+
+from log_pipeline import fields
+
+
+# NX wrapper and profiler of the current worker process
+_worker = {}
+
+
+class _LogRecords(logging.Handler):
+    """
+    Keeps (level, message, structured fields, created time) of every
+    record, they are sent to the parent process with the blade result
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelno, record.getMessage(), fields(record), record.created))
+
+
+def emit_logs(logger, logs):
+    """
+    Emits records of a worker process through a logger of this process,
+    they keep the time they have been created at
+    :param logger: logging.Logger
+    :param logs: list of (level, message, fields, created) of a blade result
+    :return: None
+    """
+
+    for level, message, extra, created in logs:
+        if not logger.isEnabledFor(level):
+            continue
+        record = logger.makeRecord(logger.name, level, '', 0, message, None, None, extra=extra)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        logger.handle(record)
+
+
+def _init_worker(stub_latency, profile):
+    """
+    Initializer of a worker process
+    :param stub_latency: float, latency of the stand-in NXOpen backend,
+        None uses the real NXOpen package
+    :param profile: bool, if NX calls are profiled
+    :return: None
+    """
+
+    if stub_latency is not None:
+        nxopen_stub.install(stub_latency)
+    _worker.clear()
+    _worker['profile'] = profile
+
+
+def _get_nx():
+    # NX session is opened on the first blade and kept for the next ones
+    if 'nx' not in _worker:
+        from nx_class import NX
+        from nx_profiler import NXProfiler
+
+        profiler = NXProfiler() if _worker.get('profile') else None
+        _worker['nx'] = NX(profiler)
+    return _worker['nx']
+
+
+def _build(file_, prt_dir, attempt, **parameters):
+    """
+    Builds one blade part in a worker process
+    :return: dict, blade result
+    """
+
+    from nx_main import build_blade, part_name
+    from blade_io import SectionsCache
+
+    part = part_name(file_, prt_dir)
+    blade = os.path.splitext(os.path.split(part)[1])[0]
+    handler = _LogRecords()
+    logger = logging.getLogger(f'{__name__}.{blade}')
+    logger.setLevel(parameters.get('log_level', logging.DEBUG))
+    logger.propagate = False
+    logger.addHandler(handler)
+
+    result = {
+        'file': file_,
+        'part': part,
+        'success': False,
+        'message': '',
+        'logs': handler.records,
+        'records': [],
+        'attempts': attempt,
+        'pid': os.getpid(),
+        'time': 0.0
+    }
+
+    start = time.perf_counter()
+    records = 0
+    try:
+        nx = _get_nx()
+        profiler = nx.profiler
+        if profiler:
+            profiler.blade = blade
+            records = len(profiler.records)
+        # NX does not create a new part in place of an existing one, a stale
+        # or half built part of an earlier attempt is removed first
+        if os.path.isfile(part):
+            os.remove(part)
+        sections_cache = SectionsCache(enabled=parameters.get('use_cache', True))
+        result['success'], result['part'] = build_blade(
+            nx, file_, prt_dir, parameters.get('coeff', 1), parameters.get('max_deviation'),
+            sections_cache, logger, fit_tolerance=parameters.get('fit_tolerance')
+        )
+        if profiler:
+            result['records'] = profiler.records[records:]
+        if not result['success']:
+            result['message'] = f"Blade part '{os.path.split(result['part'])[1]}' has not been built."
+    except Exception as ex:
+        # The session may keep a half built part, its parts are closed so
+        # the next attempt in this process does not find them loaded, and
+        # the next blade opens a new wrapper
+        nx = _worker.pop('nx', None)
+        if nx is not None:
+            try:
+                nx.close_all(part, save=False)
+            except Exception:
+                logger.error(traceback.format_exc())
+        result['message'] = f"An error occurred: {str(ex)}"
+        logger.error(traceback.format_exc())
+    finally:
+        logger.removeHandler(handler)
+    result['time'] = time.perf_counter() - start
+    return result
+
+
+def build_blades(airfoil_files, prt_dir, workers=2, retries=1, **parameters):
+    """
+    Builds blade parts in several processes, each with its own NX session
+    :param airfoil_files: list of airfoil .blade or .csv files
+    :param prt_dir: Directory of blade parts
+    :param workers: int, number of worker processes
+    :param retries: int, number of rebuilds of a failed blade
+    :param coeff: Convert to mm
+    :param use_cache: bool, if parsed CSV files are kept as binary sidecars
+    :param max_deviation: Chordal tolerance in mm for reducing spline points
+    :param fit_tolerance: Tolerance in mm of B-spline fits, splines are
+        created ByPoles if set
+    :param profile: bool, if NX calls are profiled, records are returned
+        with every blade
+    :param log_level: int, level of the blade loggers, records below it
+        are not formatted in the workers
+    :param stub_latency: float, workers use the stand-in NXOpen backend with
+        this latency, by default they do it if the stand-in is installed in
+        this process
+    :return: list of dict
+        Results in order of airfoil_files with keys file, part, success,
+        message, logs as (level, message, fields, created), records,
+        attempts, pid and time, see emit_logs
+    """
+
+    from nx_main import part_name
+
+    stub_latency = parameters.pop('stub_latency', None)
+    if stub_latency is None and nxopen_stub.is_installed():
+        stub_latency = nxopen_stub.STATS.latency
+    initargs = (stub_latency, parameters.pop('profile', False))
+
+    results = {}
+    pending = list(airfoil_files)
+    executor = None
+    try:
+        for attempt in range(1, retries + 2):
+            if not pending:
+                break
+            if executor is None:
+                executor = ProcessPoolExecutor(
+                    max_workers=min(workers, len(pending)), initializer=_init_worker, initargs=initargs
+                )
+
+            broken = False
+            futures = {executor.submit(_build, f, prt_dir, attempt, **parameters): f for f in pending}
+            failed = []
+            for future in as_completed(futures):
+                file_ = futures[future]
+                try:
+                    result = future.result()
+                except BrokenProcessPool as ex:
+                    # A crashed NX session breaks the pool, it is started again
+                    # for the blades which have to be rebuilt
+                    broken = True
+                    result = {
+                        'file': file_, 'part': part_name(file_, prt_dir), 'success': False, 'logs': [],
+                        'records': [], 'attempts': attempt, 'pid': None, 'time': 0.0,
+                        'message': f"Worker process has terminated: {str(ex)}"
+                    }
+                if not result['success']:
+                    failed.append(file_)
+                    result['logs'].append((
+                        logging.WARNING, f"Attempt {attempt} of blade '{file_}' has failed.",
+                        {'operation': 'build', 'status': False}, time.time()
+                    ))
+                if file_ in results:
+                    result['logs'] = results[file_]['logs'] + result['logs']
+                results[file_] = result
+            pending = [f for f in airfoil_files if f in failed]
+            if broken:
+                executor.shutdown()
+                executor = None
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return [results[f] for f in airfoil_files]
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+
+import numpy as np
+
+
+class BuildManifest:
+    """
+    A class records how every blade part has been built, so parts whose
+    geometry and build parameters have not changed are not rebuilt
+
+    An entry keeps a digest of the numeric airfoil content and the build
+    parameters, and the size and modification time of the saved part. A
+    part is up to date while the digest matches and the part file is the
+    one written by that build.
+
+    ...
+    Methods
+    -------
+    digest(airfoil: dict, parameters: dict)
+        Static method returns a hash of section points and parameters
+    is_current(part: str, digest: str)
+        Returns True if part has been built from the same input
+    record(part: str, digest: str, source: str)
+        Records a successfully built part
+    discard(part: str, remove: bool)
+        Removes the entry of part and, if remove, the stale part file
+    save()
+        Writes the manifest file
+    """
+
+    file_name = 'build_manifest.json'
+    version = 1
+
+    def __init__(self, prt_dir, enabled=True):
+        """
+        :param prt_dir: str, directory of blade parts, the manifest is kept there
+        :param enabled: bool, if False every part is reported as outdated
+            and nothing is written
+        """
+
+        self.path = os.path.join(prt_dir, self.file_name)
+        self.enabled = enabled
+        self.entries = {}
+        if enabled:
+            try:
+                with open(self.path, 'r') as f:
+                    data = json.load(f)
+                if data.get('version') == self.version:
+                    self.entries = data.get('parts', {})
+            except (OSError, ValueError):
+                pass
+
+    @staticmethod
+    def digest(airfoil, parameters):
+        """
+        :param airfoil: dict, section name -> (N, 3) points
+        :param parameters: dict, JSON serializable build parameters
+        :return: str
+            Hash of section names, points as float64 and parameters, text
+            formatting of the source file does not change it
+        """
+
+        h = hashlib.sha1(json.dumps(parameters, sort_keys=True).encode('utf-8'))
+        for key, val in airfoil.items():
+            val = np.ascontiguousarray(val, dtype='<f8')
+            h.update(key.encode('utf-8'))
+            h.update(np.uint64(val.size).tobytes())
+            h.update(val.tobytes())
+        return h.hexdigest()
+
+    def is_current(self, part, digest):
+        entry = self.entries.get(os.path.split(part)[1])
+        if not self.enabled or not entry or entry['digest'] != digest:
+            return False
+        try:
+            stat = os.stat(part)
+        except OSError:
+            return False
+        return stat.st_size > 0 and stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']
+
+    def record(self, part, digest, source=None):
+        if not self.enabled:
+            return
+        stat = os.stat(part)
+        self.entries[os.path.split(part)[1]] = {
+            'digest': digest,
+            'source': source,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns
+        }
+
+    def discard(self, part, remove=False):
+        """
+        :param part: str, part file
+        :param remove: bool, if the part file is deleted, NX does not create
+            a new part in place of an existing file
+        :return: None
+        """
+
+        self.entries.pop(os.path.split(part)[1], None)
+        if remove and os.path.isfile(part):
+            os.remove(part)
+
+    def save(self):
+        if not self.enabled:
+            return
+        tmp_file = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': self.version, 'parts': self.entries}, f, indent=2)
+        os.replace(tmp_file, self.path)
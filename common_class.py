@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import re
+import time
+import warnings
 
 from datetime import datetime
 
+import numpy as np
+
+from array_cache import ArrayCache
+
+
 class CommonClass:
     """
     A common class handles directories, files and etc.
@@ -24,9 +32,12 @@ class CommonClass:
     del_files(path: str, ext: tuple)
         Static method deletes files with extensions which are
         contained in tuple ext
-    get_data_from_file(in_file=None, first_line=0)
+    read_numeric(in_file: str, first_line=0, delimiter=None, chunk_size=1 << 20)
+        Static method parses a numeric text file chunk by chunk
+        into a float64 array
+    get_data_from_file(in_file=None, first_line=0, **parameters)
         Static method reads file on the first_line and
-        returns list of data
+        returns float64 array of data
 
     """
 
@@ -151,23 +162,98 @@ class CommonClass:
             return False, msg
 
     @staticmethod
-    def get_data_from_file(in_file=None, first_line=0):
+    def read_numeric(in_file, first_line=0, delimiter=None, chunk_size=1 << 20):
+        """
+        :param in_file: Full file name of a table of numbers, one row per line
+        :param first_line: Number of lines skipped before the data
+        :param delimiter: Delimiter of values, None for any whitespace
+        :param chunk_size: Size in bytes of the blocks read from the file
+        :return: np.ndarray
+            (N, M) float64 array, M is the number of values in the first
+            row, a line with another number of values raises ValueError.
+            Text is parsed block by block, so only one block of it is
+            held in memory at a time.
+        """
+
+        sep = ' ' if delimiter is None else delimiter
+        blocks = []
+        n_columns = None
+        with open(in_file, 'rb') as f:
+            for _ in range(first_line):
+                if not f.readline():
+                    break
+
+            tail = b''
+            while True:
+                chunk = f.read(chunk_size)
+                data = tail + chunk
+                if chunk:
+                    # The block ends at the last complete line
+                    end = data.rfind(b'\n') + 1
+                    data, tail = data[:end], data[end:]
+                    if not data:
+                        continue
+
+                lines = [line for line in data.split(b'\n') if line.strip()]
+                if lines:
+                    split_sep = None if delimiter is None else delimiter.encode()
+                    if n_columns is None:
+                        n_columns = len(lines[0].split(split_sep))
+                    # A ragged row would shift the values of the next rows
+                    for line in lines:
+                        if len(line.split(split_sep)) != n_columns:
+                            raise ValueError(
+                                f"File '{in_file}' has a line with a number of values other than {n_columns}: "
+                                f"'{line.decode(errors='replace').strip()}'."
+                            )
+                    text = sep.encode().join(lines)
+                    try:
+                        with warnings.catch_warnings():
+                            warnings.simplefilter('ignore', DeprecationWarning)
+                            values = np.fromstring(text, sep=sep)
+                    except ValueError:
+                        values = None
+                    if values is None or len(values) != len(lines) * n_columns:
+                        raise ValueError(f"File '{in_file}' has non numeric or incomplete lines.")
+                    blocks.append(values.reshape(-1, n_columns))
+                if not chunk:
+                    break
+
+        if not blocks:
+            return np.empty((0, n_columns or 0))
+        return blocks[0] if len(blocks) == 1 else np.concatenate(blocks)
+
+    @staticmethod
+    def get_data_from_file(in_file=None, first_line=0, **parameters):
         """
         :param in_file: Full file name from which data will be got
         :param first_line: First line from which data will be extracted
-        :return: Bool, str
-            True if data was obtained or False otherwise and logging message
+        :param delimiter: Delimiter of values, None for any whitespace
+        :param chunk_size: Size in bytes of the blocks read from the file
+        :param mmap: Bool, if parsed data is kept as a .npy sidecar and
+            memory-mapped on later calls
+        :param cache: ArrayCache of the sidecars, used with mmap
+        :return: Bool, np.ndarray or str
+            True and float64 array of data if it was obtained or False
+            otherwise and logging message
         """
 
-        points = []
+        delimiter = parameters.get('delimiter', None)
+        chunk_size = parameters.get('chunk_size', 1 << 20)
+        cache = parameters.get('cache', None)
+        if parameters.get('mmap', False) and cache is None:
+            cache = ArrayCache()
+
+        def parser(name):
+            return CommonClass.read_numeric(name, first_line, delimiter, chunk_size)
+
         if in_file:
             try:
-                with open(in_file, 'r') as f:
-                    content = f.readlines()
-                    for point in content[first_line:]:
-                        point = point.split()
-                        points.append(point)
-                return True, points
+                if cache is not None:
+                    # A sidecar does not record first_line and delimiter, a
+                    # cache is meant for files read with the same options
+                    return True, cache.load(in_file, parser)
+                return True, parser(in_file)
             except PermissionError:
                 msg = f"File {in_file} permission denied."
                 return False, msg
@@ -176,4 +262,234 @@ class CommonClass:
                 return False, msg
             except FileNotFoundError:
                 msg = f"File '{in_file}' has not been found."
-                return False, msg
\ No newline at end of file
+                return False, msg
+            except ValueError as ex:
+                msg = str(ex)
+                return False, msg
+
+
+def natural_key(text):
+    """
+    :param text: str
+    :return: list, sort key that orders numbers in text by value,
+        e.g. blade2 before blade10
+    """
+
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', text)]
+
+
+class FileIndex:
+    """
+    A class keeps size, modification time and extension of every file
+    of directory trees, trees are walked once and file lists are
+    answered from the index
+
+    A refresh lists again only the directories whose modification time
+    has changed, files are added to or removed from a directory by
+    changing it. A directory modified less than RACY_NS before its last
+    listing is listed again as well, file systems with a coarse time
+    resolution do not change its time for files added right after the
+    listing. File lists are naturally sorted and kept until the next
+    change of the index.
+
+    ...
+    Methods
+    -------
+    refresh(path=None, check_files=False)
+        Walks the tree of path or all indexed trees and returns
+        added, changed and removed files
+    add(file_names: list)
+        Adds files written by the caller to the index
+    get_files(path: str, ext: tuple, recursive=False)
+        Returns files with extension which is contained in tuple ext,
+        the same way as CommonClass.get_files
+    stat(file_name: str)
+        Returns size, modification time and extension of an indexed file
+    """
+
+    # Time resolution of the coarsest file systems, FAT keeps 2 s
+    RACY_NS = 2_000_000_000
+
+    def __init__(self, root=None):
+        """
+        :param root: str, directory tree indexed at once
+        """
+
+        self._dirs = {}
+        self._lookups = {}
+        self.scans = 0
+        if root:
+            self.refresh(root)
+
+    @staticmethod
+    def _key(path):
+        return os.path.normcase(os.path.abspath(path))
+
+    def _scan(self, key, path, mtime_ns, changes):
+        # Lists one directory and records the difference to the last listing
+        scan_ns = time.time_ns()
+        files, dirs = {}, []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns, os.path.splitext(entry.name)[1])
+        self.scans += 1
+
+        old_entry = self._dirs.get(key, {})
+        old = old_entry.get('files', {})
+        for name, val in files.items():
+            if name not in old:
+                changes['added'].append(os.path.join(path, name))
+            elif old[name][:2] != val[:2]:
+                changes['changed'].append(os.path.join(path, name))
+        changes['removed'].extend(os.path.join(path, name) for name in old if name not in files)
+        for sub_dir in set(old_entry.get('dirs', [])) - set(dirs):
+            self._forget(self._key(sub_dir), changes)
+        self._dirs[key] = {'path': path, 'mtime_ns': mtime_ns, 'scan_ns': scan_ns, 'files': files, 'dirs': dirs}
+
+    def _is_dirty(self, entry, mtime_ns):
+        # A listing is not trusted while the directory time may not have
+        # moved on yet for a later change
+        return (
+            entry is None or entry['mtime_ns'] != mtime_ns
+            or entry['scan_ns'] - mtime_ns < self.RACY_NS
+        )
+
+    def _forget(self, key, changes):
+        # Drops a removed directory and everything under it
+        entry = self._dirs.pop(key, None)
+        if entry:
+            changes['removed'].extend(os.path.join(entry['path'], name) for name in entry['files'])
+            for sub_dir in entry['dirs']:
+                self._forget(self._key(sub_dir), changes)
+
+    def refresh(self, path=None, check_files=False):
+        """
+        :param path: str, root of the refreshed tree, all indexed trees
+            if None
+        :param check_files: bool, if files of unchanged directories are
+            checked as well, a file rewritten in place does not change
+            its directory
+        :return: dict
+            'added', 'changed' and 'removed' lists of file names
+        """
+
+        changes = {'added': [], 'changed': [], 'removed': []}
+        if path is None:
+            known = set(self._dirs)
+            stack = [
+                entry['path'] for key, entry in self._dirs.items()
+                if self._key(os.path.dirname(entry['path'])) not in known
+            ]
+        else:
+            stack = [os.path.abspath(path)]
+
+        while stack:
+            path = stack.pop()
+            key = self._key(path)
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+                entry = self._dirs.get(key)
+                if self._is_dirty(entry, mtime_ns):
+                    self._scan(key, path, mtime_ns, changes)
+                elif check_files:
+                    for name, val in entry['files'].items():
+                        stat = os.stat(os.path.join(path, name))
+                        if (stat.st_size, stat.st_mtime_ns) != val[:2]:
+                            entry['files'][name] = (stat.st_size, stat.st_mtime_ns, val[2])
+                            changes['changed'].append(os.path.join(path, name))
+            except (FileNotFoundError, NotADirectoryError):
+                self._forget(key, changes)
+                continue
+            except PermissionError:
+                continue
+
+            stack.extend(self._dirs[key]['dirs'])
+
+        if any(changes.values()):
+            self._lookups.clear()
+        return changes
+
+    def add(self, file_names):
+        """
+        :param file_names: list, files written by the caller, files of
+            directories which are not indexed are skipped
+        :return: dict
+            'added' and 'changed' lists of file names
+        """
+
+        changes = {'added': [], 'changed': []}
+        for file_name in file_names:
+            path, name = os.path.split(os.path.abspath(file_name))
+            entry = self._dirs.get(self._key(path))
+            if entry is None:
+                continue
+            stat = os.stat(file_name)
+            val = (stat.st_size, stat.st_mtime_ns, os.path.splitext(name)[1])
+            old = entry['files'].get(name)
+            if old is None:
+                changes['added'].append(os.path.join(path, name))
+            elif old[:2] != val[:2]:
+                changes['changed'].append(os.path.join(path, name))
+            entry['files'][name] = val
+
+        if any(changes.values()):
+            self._lookups.clear()
+        return changes
+
+    def get_files(self, path: str, ext: tuple, recursive=False):
+        """
+        :param path: Full directory name with extracting files
+        :param ext: Tuple of extension of files that will be extracting
+        :param recursive: Bool, if files of subdirectories are extracted too
+        :return: Bool, list or str
+            True and naturally sorted file names if files has been
+            obtained or False otherwise and logging message
+        """
+
+        key = self._key(path)
+        lookup = (key, tuple(ext), recursive)
+        if lookup in self._lookups:
+            return True, list(self._lookups[lookup])
+
+        if key not in self._dirs:
+            # A new tree is indexed, errors are the ones of CommonClass.get_files
+            try:
+                os.scandir(path).close()
+            except (PermissionError, NotADirectoryError, FileNotFoundError):
+                return CommonClass.get_files(path, ext)
+            self.refresh(path)
+            if key not in self._dirs:
+                return CommonClass.get_files(path, ext)
+
+        files = []
+        stack = [key]
+        while stack:
+            entry = self._dirs.get(stack.pop())
+            if entry is None:
+                continue
+            files.extend(
+                os.path.join(entry['path'], name)
+                for name, (_, _, extension) in entry['files'].items() if extension in ext
+            )
+            if recursive:
+                stack.extend(self._key(d) for d in entry['dirs'])
+
+        files.sort(key=natural_key)
+        self._lookups[lookup] = files
+        return True, list(files)
+
+    def stat(self, file_name):
+        """
+        :param file_name: str, indexed file
+        :return: tuple or None
+            Size, modification time in ns and extension, None if the file
+            is not in the index
+        """
+
+        path, name = os.path.split(os.path.abspath(file_name))
+        entry = self._dirs.get(self._key(path))
+        return entry['files'].get(name) if entry else None
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import logging
+import contextlib
+
+import numpy as np
+
+
+SPLINE_TYPES = ('ThroughPoints', 'ByPoles')
+TOLERANCES = ('distance_tolerance', 'chaining_tolerance', 'angle_tolerance', 'g0', 'g1')
+
+
+class FeaturePlan:
+    """
+    A class describes NX parts as a list of operations, the plan is
+    checked without NX and applied with execute_plan
+
+    Every method appends one operation and returns the plan, so a
+    blade is written as one chain of calls. Sections of the through
+    curves and swept bodies are given by spline names of the same part.
+
+    ...
+    Methods
+    -------
+    part(file_name: str, **parameters)
+        Opens a new part, parameters of NX.create_new_nx_file
+    spline(name: str, points, **parameters)
+        Adds a studio spline, parameters of NX.create_spline_with_points
+    through_curves(name: str, sections: list, help_points: list, **parameters)
+        Adds a body through section splines, parameters of NX.through_curves
+    swept(name: str, sections: list, guides: list, section_help_points: list,
+          guide_help_points: list, **parameters)
+        Adds a swept body, parameters of NX.swept
+    close()
+        Saves and closes the part
+    validate()
+        Returns True if the plan can be applied and messages of every problem
+    """
+
+    def __init__(self):
+        self.operations = []
+
+    def _add(self, op, name, parameters):
+        self.operations.append({'op': op, 'name': name, 'parameters': parameters})
+        return self
+
+    def part(self, file_name, **parameters):
+        return self._add('part', file_name, {**parameters, 'file_name': file_name})
+
+    def spline(self, name, points, **parameters):
+        return self._add('spline', name, {**parameters, 'points': points})
+
+    def through_curves(self, name, sections, help_points, **parameters):
+        return self._add('through_curves', name, {
+            **parameters, 'sections': list(sections), 'help_points': list(help_points)
+        })
+
+    def swept(self, name, sections, guides, section_help_points, guide_help_points, **parameters):
+        return self._add('swept', name, {
+            **parameters,
+            'sections': list(sections),
+            'guides': list(guides),
+            'section_help_points': list(section_help_points),
+            'guide_help_points': list(guide_help_points)
+        })
+
+    def close(self):
+        return self._add('close', None, {})
+
+    def validate(self):
+        """
+        :return: Bool, list
+            True if the plan can be applied or False otherwise, and
+            messages of every problem found
+        """
+
+        errors = []
+        part = None
+        names = {}
+        for i, operation in enumerate(self.operations):
+            op, name, parameters = operation['op'], operation['name'], operation['parameters']
+            where = f"Operation {i} '{op}'" + (f" {name}" if name is not None else '')
+
+            if op == 'part':
+                if part is not None:
+                    errors.append(f"{where}: part '{part}' is not closed.")
+                part, names = name, {}
+                if not name:
+                    errors.append(f"{where}: no file name.")
+                continue
+            if part is None:
+                errors.append(f"{where}: no open part.")
+                continue
+            if op == 'close':
+                part = None
+                continue
+
+            if name in names:
+                errors.append(f"{where}: name '{name}' is used twice.")
+            if op == 'spline':
+                errors.extend(_check_spline(where, parameters))
+            elif op in ('through_curves', 'swept'):
+                errors.extend(_check_body(where, op, parameters, names))
+            else:
+                errors.append(f"{where}: unknown operation.")
+            names[name] = op
+
+        if part is not None:
+            errors.append(f"Part '{part}' is not closed.")
+        return not errors, errors
+
+
+def _check_spline(where, parameters):
+    errors = []
+    try:
+        points = np.asarray(parameters['points'], dtype=float)
+    except (KeyError, ValueError, TypeError):
+        return [f"{where}: points can not be converted to float."]
+    if points.ndim != 2 or points.shape[1] < 3:
+        return [f"{where}: points have to be a list of [x, y, z]."]
+    if not np.isfinite(points[:, :3]).all():
+        errors.append(f"{where}: points are not finite.")
+
+    degree = parameters.get('degree', 3)
+    if not isinstance(degree, (int, np.integer)) or degree < 1:
+        errors.append(f"{where}: wrong degree {degree}.")
+    elif len(points) <= degree:
+        errors.append(f"{where}: {len(points)} points are not enough for degree {degree}.")
+    if parameters.get('spline_type', 'ThroughPoints') not in SPLINE_TYPES:
+        errors.append(f"{where}: spline type has to be one of {SPLINE_TYPES}.")
+    if not parameters.get('coeff', 1) > 0:
+        errors.append(f"{where}: coeff has to be positive.")
+    for key in ('max_deviation', 'fit_tolerance'):
+        if parameters.get(key) is not None and not parameters[key] >= 0:
+            errors.append(f"{where}: {key} can not be negative.")
+    return errors
+
+
+def _check_body(where, op, parameters, names):
+    errors = []
+    sections = parameters['sections']
+    min_sections = 2 if op == 'through_curves' else 1
+    if len(sections) < min_sections:
+        errors.append(f"{where}: at least {min_sections} sections are needed.")
+    curves = [('section', sections)]
+    help_points = [('help_points', sections, parameters.get('help_points'))]
+
+    if op == 'swept':
+        guides = parameters['guides']
+        if not 1 <= len(guides) <= 3:
+            errors.append(f"{where}: 1 to 3 guides are needed, {len(guides)} are given.")
+        curves.append(('guide', guides))
+        help_points = [
+            ('section_help_points', sections, parameters['section_help_points']),
+            ('guide_help_points', guides, parameters['guide_help_points'])
+        ]
+
+    for kind, curve_names in curves:
+        for curve in curve_names:
+            if names.get(curve) != 'spline':
+                errors.append(f"{where}: {kind} '{curve}' is not a spline of the part.")
+    for key, curve_names, points in help_points:
+        if points is None or len(points) != len(curve_names):
+            errors.append(f"{where}: {key} have to be given for every curve.")
+
+    for key in TOLERANCES:
+        if key in parameters and not parameters[key] > 0:
+            errors.append(f"{where}: {key} has to be positive.")
+    if parameters.get('chaining_tolerance', 0.0095) > parameters.get('distance_tolerance', 0.01):
+        errors.append(f"{where}: chaining tolerance is greater than distance tolerance.")
+    return errors
+
+
+def _discard_part(nx, part):
+    # Closes the part without saving it and removes its file
+    is_closed, msg = nx.close_all(part, save=False)
+    try:
+        if os.path.isfile(part):
+            os.remove(part)
+    except OSError as ex:
+        return False, f"File {part} has not been removed. {str(ex)}"
+    return is_closed, msg
+
+
+def execute_plan(nx, plan, logger=None, bulk=True):
+    """
+    Checks a plan and applies it operation by operation, features of a
+    part whose curves have failed are not created
+    :param nx: NX, wrapper of the NX session
+    :param plan: FeaturePlan
+    :param logger: logging.Logger, messages of every operation with blade,
+        section, operation, duration and status fields, see log_pipeline
+    :param bulk: bool, if features of every part are created in one
+        NX.bulk_creation block, a failed feature then undoes all
+        features of its part and the part is closed without saving
+    :return: Bool, list
+        True if every operation has succeeded or False otherwise, and
+        (op, name, result, message) of every applied operation
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    is_valid, errors = plan.validate()
+    if not is_valid:
+        for error in errors:
+            logger.error(error)
+        return False, [('plan', None, False, error) for error in errors]
+
+    results = []
+    blade = None
+
+    def report(op, name, result, msg, start):
+        level = logging.INFO if result else logging.ERROR if op == 'close' else logging.WARNING
+        # Nothing is formatted for a disabled level
+        if logger.isEnabledFor(level):
+            extra = {
+                'blade': blade, 'section': None if op in ('part', 'close', 'update') else name, 'operation': op,
+                'duration': time.perf_counter() - start, 'status': bool(result)
+            }
+            if result or op == 'close':
+                logger.log(level, msg, extra=extra)
+            else:
+                logger.log(level, '%s %s %s', msg, op.capitalize(), name, extra=extra)
+        results.append((op, name, result, msg))
+
+    tags = {}
+    part = None
+    block = None
+    features = contextlib.ExitStack()
+    try:
+        with features:
+            for operation in plan.operations:
+                op, name, parameters = operation['op'], operation['name'], operation['parameters']
+                start = time.perf_counter()
+
+                if op == 'part':
+                    part = name
+                    blade = os.path.splitext(os.path.split(name)[1])[0]
+                    result, msg = nx.create_new_nx_file(**parameters)
+                    if not result:
+                        part = None
+                    elif bulk:
+                        block = features.enter_context(nx.bulk_creation(f'Create {os.path.split(name)[1]}'))
+                elif part is None:
+                    # Operations of a part which has not been created
+                    result, msg = False, f"Part has not been created, '{op}' {name} is skipped."
+                elif op == 'close':
+                    # Model is updated before the part is saved
+                    features.close()
+                    if block is not None and block.update_errors:
+                        report('update', part, False, f'Update has failed with {block.update_errors} errors.', start)
+                    if block is not None and block.rolled_back:
+                        # An empty part is not saved, it would look like a built one
+                        _, msg = _discard_part(nx, part)
+                        result, msg = False, f"Features have been undone, part {part} has not been saved. {msg}"
+                    else:
+                        result, msg = nx.close_all(part)
+                    part, tags, block = None, {}, None
+                elif block is not None and block.rolled_back:
+                    result, msg = False, f"Features of the part have been undone, '{op}' {name} is skipped."
+                elif op == 'spline':
+                    result, msg = nx.create_spline_with_points(name=name, **parameters)
+                    if result:
+                        tags[name] = result
+                else:
+                    curves = parameters['sections'] + parameters.get('guides', [])
+                    missing = [curve for curve in curves if curve not in tags]
+                    if missing:
+                        result, msg = False, f"Curves {', '.join(missing)} have not been created."
+                    else:
+                        body_parameters = {
+                            **parameters,
+                            'sections': {key: tags[key] for key in parameters['sections']},
+                        }
+                        if op == 'swept':
+                            body_parameters['guides'] = {i: tags[key] for i, key in enumerate(parameters['guides'])}
+                            result, msg = nx.swept(**body_parameters)
+                        else:
+                            result, msg = nx.through_curves(**body_parameters)
+
+                if not result and block is not None and op != 'part':
+                    block.rollback()
+                report(op, name, result, msg, start)
+    except Exception:
+        # A part left open by an error is not saved
+        if part is not None:
+            _discard_part(nx, part)
+        raise
+
+    return all(r[2] for r in results), results
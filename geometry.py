@@ -0,0 +1,630 @@
+# -*- coding: utf-8 -*-
+
+import itertools
+
+import numpy as np
+
+from spline_fit import bspline_basis, interpolate_bspline
+
+_HASH_PRIMES = np.array([73856093, 19349663, 83492791], dtype=np.uint64)
+
+# Cell and neighbour cells of the grid hash, the cell itself first
+_NEIGHBOURS = np.array(sorted(itertools.product((-1, 0, 1), repeat=3), key=np.any), dtype=np.int64)
+
+
+class Transform:
+    """
+    A class describes a chain of coordinate operations applied
+    to a (N, 3) array of points in one pass
+
+    Every chaining method returns a new Transform, so partially built
+    chains can be shared. The linear part of the chain is folded into
+    a single 3x3 matrix and the reversal into a single slice.
+
+    ...
+    Methods
+    -------
+    reverse()
+        Reverses the order of points
+    swap_axes(order: tuple)
+        Reorders coordinates, e.g. (1, 2, 0) gives [y, z, x]
+    mirror(axis: int)
+        Mirrors coordinates about the plane normal to axis
+    rotate(axis: int, angle: float, degrees=True)
+        Rotates points about the coordinate axis
+    scale(factor: float)
+        Scales coordinates, e.g. units converting
+    linear(matrix)
+        Appends an arbitrary 3x3 linear map
+    apply(points)
+        Applies the chain to points and returns new array
+    """
+
+    def __init__(self, matrix=None, reverse=False):
+        """
+        :param matrix: 3x3 array-like, linear part of the transform
+        :param reverse: bool, if the points order has to be reversed
+        """
+
+        self.matrix = np.eye(3) if matrix is None else np.array(matrix, dtype=float)
+        self.reversed = reverse
+
+    def __repr__(self):
+        return f'Transform(matrix={self.matrix.tolist()}, reverse={self.reversed})'
+
+    def reverse(self):
+        return Transform(self.matrix, not self.reversed)
+
+    def linear(self, matrix):
+        matrix = np.asarray(matrix, dtype=float)
+        if matrix.shape != (3, 3):
+            raise ValueError(f"Linear map must be 3x3, got {matrix.shape}.")
+        return Transform(matrix @ self.matrix, self.reversed)
+
+    def swap_axes(self, order):
+        if sorted(order) != [0, 1, 2]:
+            raise ValueError(f"Axes order {order} is not a permutation of (0, 1, 2).")
+        return self.linear(np.eye(3)[list(order)])
+
+    def mirror(self, axis):
+        m = np.eye(3)
+        m[axis, axis] = -1.0
+        return self.linear(m)
+
+    def rotate(self, axis, angle, degrees=True):
+        if degrees:
+            angle = np.radians(angle)
+        c, s = np.cos(angle), np.sin(angle)
+        i, j = [k for k in range(3) if k != axis]
+        if axis == 1:
+            i, j = j, i
+        m = np.eye(3)
+        m[i, i], m[i, j], m[j, i], m[j, j] = c, -s, s, c
+        return self.linear(m)
+
+    def scale(self, factor):
+        return self.linear(np.eye(3) * factor)
+
+    def then(self, other):
+        """
+        :param other: Transform that is applied after this one
+        :return: Transform, composition of both chains
+        """
+        return Transform(other.matrix @ self.matrix, self.reversed != other.reversed)
+
+    def apply(self, points):
+        """
+        :param points: array-like of shape (N, 3)
+        :return: np.ndarray of shape (N, 3), dtype float64
+        """
+
+        a = np.asarray(points, dtype=float)
+        if self.reversed:
+            a = a[::-1]
+
+        # Signed permutations with scaling (swap, mirror, scale) are applied
+        # through indexing, so coordinates are copied bit-exactly
+        nonzero = self.matrix != 0
+        if (nonzero.sum(axis=1) <= 1).all():
+            cols = nonzero.argmax(axis=1)
+            factors = self.matrix[np.arange(3), cols]
+            out = a[:, cols]
+            if not (factors == 1.0).all():
+                out *= factors
+            out[:, ~nonzero.any(axis=1)] = 0.0
+            return out
+        return a @ self.matrix.T
+
+
+def _grid_keys(cells):
+    h = cells.astype(np.uint64) * _HASH_PRIMES
+    return h[:, 0] ^ h[:, 1] ^ h[:, 2]
+
+
+def unique_points(points, tolerance=0.0):
+    """
+    Finds duplicated points keeping the first occurrence in the original order
+
+    Points are bucketed into a hashed grid of cells two tolerances wide,
+    so a point is compared only with points of its own cell and of the
+    neighbour cells which are within tolerance of it. The points of a
+    cell are tried in their original order and only before the earliest
+    close point found so far, so crowded cells of duplicates cost a few
+    comparisons per point and the work grows close to linearly with the
+    number of points however the tolerance compares to the point spacing.
+    A point is a duplicate if it lies within tolerance of any earlier
+    point; it is then mapped to the first point of that chain.
+
+    :param points: array-like of shape (N, 3)
+    :param tolerance: float, distance below which points are merged,
+        0 removes bit-identical points only
+    :return: np.ndarray, np.ndarray
+        Sorted indices of the kept points and, for every input point,
+        the position of its kept point in the first array
+    """
+
+    # + 0.0 turns -0.0 into 0.0, so both hash into the same cell
+    a = np.ascontiguousarray(points, dtype=float).reshape(-1, 3) + 0.0
+    n = len(a)
+    if tolerance > 0:
+        cell_size = 2.0 * tolerance
+        scaled = a / cell_size
+        cells = np.floor(scaled).astype(np.int64)
+        # Distances to the low and high faces of the cell
+        to_low = (scaled - cells) * cell_size
+        to_high = cell_size - to_low
+        offsets = _NEIGHBOURS
+    else:
+        cells = a.view(np.int64)
+        offsets = _NEIGHBOURS[:1]
+
+    keys = _grid_keys(cells)
+    # Points of a cell keep their original order
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+
+    # Runs of equal keys in the sorted order
+    is_start = np.empty(n, dtype=bool)
+    is_start[:1] = True
+    np.not_equal(sorted_keys[1:], sorted_keys[:-1], out=is_start[1:])
+    starts = np.flatnonzero(is_start)
+    run_of_sorted = np.cumsum(is_start) - 1
+    run_start = starts[run_of_sorted]
+    run_end = np.append(starts[1:], n)[run_of_sorted]
+
+    # Bitmap of occupied cells, most empty neighbour cells are rejected
+    # by it before the sorted keys are searched
+    mask = (1 << max(10, int(8 * n).bit_length())) - 1
+    occupied = np.zeros(mask + 1, dtype=bool)
+    occupied[keys & np.uint64(mask)] = True
+
+    earliest = np.arange(n)
+
+    for offset in offsets:
+        if offset.any():
+            # Points whose neighbour cell is within tolerance, slightly
+            # widened so that rounding never hides a pair across a face
+            gap = np.where(offset > 0, to_high, np.where(offset < 0, to_low, 0.0))
+            p = np.flatnonzero(np.einsum('ij,ij->i', gap, gap) <= (tolerance * (1.0 + 1e-6)) ** 2)
+            neighbour_keys = _grid_keys(cells[p] + offset)
+            maybe = occupied[neighbour_keys & np.uint64(mask)]
+            p, neighbour_keys = p[maybe], neighbour_keys[maybe]
+            lo = np.minimum(np.searchsorted(sorted_keys, neighbour_keys), n - 1)
+            found = sorted_keys[lo] == neighbour_keys
+            p, lo = p[found], lo[found]
+            hi = run_end[lo]
+        else:
+            # Points after the first one of their cell
+            later = np.flatnonzero(~is_start)
+            p, lo, hi = order[later], run_start[later], run_end[later]
+
+        # Every point tries the next point of the neighbour cell until
+        # one is close or the cell has no point left before the earliest
+        # close point found so far
+        while len(p):
+            q = order[lo]
+            earlier = q < earliest[p]
+            p, q, lo, hi = p[earlier], q[earlier], lo[earlier], hi[earlier]
+            d = a[p] - a[q]
+            if tolerance > 0:
+                close = np.einsum('ij,ij->i', d, d) <= tolerance * tolerance
+            else:
+                close = ~d.any(axis=1)
+            earliest[p[close]] = q[close]
+            lo += 1
+            left = ~close & (lo < hi)
+            p, lo, hi = p[left], lo[left], hi[left]
+
+    # Follow every chain of duplicates to its first point
+    while True:
+        root = earliest[earliest]
+        if np.array_equal(root, earliest):
+            break
+        earliest = root
+
+    index = np.flatnonzero(earliest == np.arange(n))
+    inverse = np.searchsorted(index, earliest)
+    return index, inverse
+
+
+def _segment_distances(points, start, end):
+    # Distances of points to the segment start-end
+    chord = end - start
+    length = chord @ chord
+    rel = points - start
+    if length == 0.0:
+        return np.sqrt(np.einsum('ij,ij->i', rel, rel))
+    t = np.clip(rel @ chord / length, 0.0, 1.0)
+    d = rel - t[:, None] * chord
+    return np.sqrt(np.einsum('ij,ij->i', d, d))
+
+
+def _spline_distances(points, kept, degree, closed, samples=32):
+    """
+    Distances of points to the interpolating spline through the kept ones
+    :param points: (N, 3) array
+    :param kept: np.ndarray, sorted indices of the kept points
+    :param samples: int, the spline is sampled this many times on every
+        span between kept points
+    :return: np.ndarray, (N,) distances, every point is compared with the
+        span of the kept points around it
+    """
+
+    knots, poles, u = interpolate_bspline(points[kept], degree, closed)
+
+    # Span of every point between the parameters of the kept points, the
+    # last span of a closed spline returns to the first kept point
+    ends = np.append(u, u[0] + 1.0) if closed else u
+    span = np.searchsorted(kept, np.arange(len(points)), side='right') - 1
+    span = np.clip(np.where(span < 0, len(ends) - 2, span), 0, len(ends) - 2)
+
+    t = np.linspace(0.0, 1.0, samples + 1)
+    params = ends[:-1, None] + (ends[1:] - ends[:-1])[:, None] * t
+    if closed:
+        params = np.mod(params, 1.0)
+    curve = (bspline_basis(knots, degree, params.ravel()) @ poles).reshape(len(ends) - 1, samples + 1, -1)
+
+    # Distance of every point to the sampled polyline of its span
+    start, end = curve[span, :-1], curve[span, 1:]
+    chord = end - start
+    rel = points[:, None] - start
+    length = np.einsum('nsk,nsk->ns', chord, chord)
+    f = np.clip(np.einsum('nsk,nsk->ns', rel, chord) / np.maximum(length, 1e-300), 0.0, 1.0)
+    d = rel - f[..., None] * chord
+    return np.sqrt(np.einsum('nsk,nsk->ns', d, d).min(axis=1))
+
+
+def simplify_points(points, max_deviation, closed=False, degree=None):
+    """
+    Reduces a polyline with the Ramer-Douglas-Peucker method
+
+    Every dropped point lies within max_deviation of the polyline
+    through the kept points. If degree is set, points are kept as well
+    until every dropped point lies within max_deviation of the
+    interpolating spline of that degree through the kept points, see
+    spline_fit.interpolate_bspline.
+
+    :param points: array-like of shape (N, 3)
+    :param max_deviation: float, chordal tolerance
+    :param closed: bool, if the last point is connected to the first one
+    :param degree: int, degree of the spline through the kept points
+    :return: np.ndarray, sorted indices of the kept points
+    """
+
+    a = np.asarray(points, dtype=float)
+    n = len(a)
+    if n < 3 or not max_deviation or max_deviation <= 0:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    if closed:
+        # Split the loop at the first point and the point farthest from it
+        far = int(np.argmax(np.einsum('ij,ij->i', a - a[0], a - a[0])))
+        if far == 0:
+            return np.array([0])
+        a = np.vstack((a, a[:1]))
+        keep[[0, far]] = True
+        stack = [(0, far), (far, n)]
+    else:
+        keep[[0, n - 1]] = True
+        stack = [(0, n - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        d = _segment_distances(a[first + 1:last], a[first], a[last])
+        i = int(np.argmax(d))
+        if d[i] > max_deviation:
+            i += first + 1
+            keep[i] = True
+            stack.append((first, i))
+            stack.append((i, last))
+
+    if not degree:
+        return np.flatnonzero(keep)
+
+    # The spline differs from the polyline, the farthest point of every
+    # span out of tolerance is kept until none is left
+    a = a[:n]
+    while True:
+        kept = np.flatnonzero(keep)
+        if len(kept) <= degree:
+            return np.arange(n)
+        try:
+            d = _spline_distances(a, kept, degree, closed)
+        except (ValueError, np.linalg.LinAlgError):
+            return np.arange(n)
+        out = d > max_deviation
+        if not out.any():
+            return kept
+        index = np.flatnonzero(out)
+        span = np.searchsorted(kept, index, side='right')
+        index = index[np.lexsort((-d[index], span))]
+        _, first = np.unique(np.sort(span), return_index=True)
+        keep[index[first]] = True
+
+
+# Guide curve stations (side, chord fraction): side 0 runs from the
+# leading to the trailing edge in point order, side 1 runs back
+GUIDE_STATIONS = ((0, 0.05), (0, 0.95), (1, 0.95))
+
+
+def _pad_sections(sections):
+    counts = np.array([len(s) for s in sections], dtype=int)
+    width = max(counts.max(initial=0), 1)
+    padded = np.full((len(sections), width, 3), np.nan)
+    mask = np.arange(width) < counts[:, None]
+    if counts.sum():
+        padded[mask] = np.concatenate([np.asarray(s, dtype=float)[:, :3] for s in sections if len(s)])
+    return padded, mask, counts
+
+
+def blade_landmarks(sections):
+    """
+    Finds leading and trailing edges of every closed section of a blade
+
+    The edges are the ends of the longest chord. The end with the
+    thinner profile within 5 % of the chord is the trailing edge.
+
+    :param sections: list of (N_i, 3) arrays, point counts may differ
+    :return: dict
+        'leading_edge', 'trailing_edge': (S, 3) points,
+        'le_index', 'te_index': (S,) indices of the edge points,
+        'chord': (S,) chord lengths,
+        'fraction': (S, N) chordwise position of every point, 0 at the
+        leading and 1 at the trailing edge, NaN past the section end
+    """
+
+    padded, mask, counts = _pad_sections(sections)
+    rows = np.arange(len(padded))
+
+    def farthest(origin):
+        d = np.einsum('snk,snk->sn', padded - origin[:, None], padded - origin[:, None])
+        return np.argmax(np.where(mask, d, -np.inf), axis=1)
+
+    # Longest chord: farthest point from the centroid, then farthest from it
+    a = farthest(np.nanmean(padded, axis=1))
+    b = farthest(padded[rows, a])
+
+    chord = padded[rows, b] - padded[rows, a]
+    length = np.linalg.norm(chord, axis=1)
+    relative = padded - padded[rows, a][:, None]
+    fraction = np.einsum('snk,sk->sn', relative, chord) / (length ** 2)[:, None]
+    offset = np.linalg.norm(relative - fraction[..., None] * chord[:, None], axis=2)
+
+    # Leading edge is round, the profile is thicker next to it
+    width_a = np.where(mask & (fraction <= 0.05), offset, 0.0).max(axis=1)
+    width_b = np.where(mask & (fraction >= 0.95), offset, 0.0).max(axis=1)
+    swap = width_b > width_a
+    le, te = np.where(swap, b, a), np.where(swap, a, b)
+    fraction[swap] = 1.0 - fraction[swap]
+
+    return {
+        'leading_edge': padded[rows, le],
+        'trailing_edge': padded[rows, te],
+        'le_index': le,
+        'te_index': te,
+        'chord': length,
+        'fraction': fraction
+    }
+
+
+def guide_curves(sections, stations=GUIDE_STATIONS):
+    """
+    Picks guide curve points of a swept blade on every section
+
+    Every guide passes through the section points closest to its chord
+    fraction on its side, so the guides lie on the section splines.
+
+    :param sections: list of (N_i, 3) arrays of closed sections ordered
+        along the span, all in the same direction
+    :param stations: tuple of (side, chord fraction), side 0 runs from
+        the leading to the trailing edge in point order, side 1 back
+    :return: np.ndarray, np.ndarray, np.ndarray
+        Guide polylines (G, S, 3), section help points (S, 3), the first
+        point of every section, and guide help points (G, 3), the first
+        point of every guide
+    """
+
+    padded, mask, counts = _pad_sections(sections)
+    landmarks = blade_landmarks(sections)
+    le, te = landmarks['le_index'], landmarks['te_index']
+
+    # Position of every point along the loop starting at the leading edge
+    position = np.mod(np.arange(padded.shape[1]) - le[:, None], counts[:, None])
+    te_position = np.mod(te - le, counts)[:, None]
+    on_side = (position <= te_position, (position >= te_position) | (position == 0))
+
+    rows = np.arange(len(padded))
+    guides = np.empty((len(stations), len(padded), 3))
+    for g, (side, fraction) in enumerate(stations):
+        cost = np.abs(landmarks['fraction'] - fraction)
+        index = np.argmin(np.where(mask & on_side[side], cost, np.inf), axis=1)
+        guides[g] = padded[rows, index]
+
+    return guides, padded[:, 0], guides[:, 0]
+
+
+def section_areas(sections):
+    """
+    Vector areas of closed sections by the Newell method
+    :param sections: list of (N_i, 3) arrays
+    :return: np.ndarray, (S, 3), normal to every section with the length
+        of its area, it points along the axis the points turn
+        counterclockwise about
+    """
+
+    padded, mask, counts = _pad_sections(sections)
+    rows = np.arange(len(padded))[:, None]
+    following = np.arange(1, padded.shape[1] + 1)
+    following = padded[rows, np.where(following < counts[:, None], following, 0)]
+    cross = np.cross(np.nan_to_num(padded), np.nan_to_num(following))
+    return 0.5 * np.where(mask[..., None], cross, 0.0).sum(axis=1)
+
+
+def orient_sections(sections, axis=None):
+    """
+    Gives all sections of a blade the same winding and start point
+
+    Sections turning clockwise about the axis are reversed, then every
+    section is rolled to start at its leading edge. NX sections built
+    from the result need no direction checks.
+
+    :param sections: list of (N_i, 3) arrays of closed sections
+    :param axis: (3,) direction the sections turn counterclockwise
+        about, by default from the first to the last section centroid,
+        or the mean section normal for a single section
+    :return: list, np.ndarray
+        Reordered sections and a bool array of the reversed ones
+    """
+
+    areas = section_areas(sections)
+    if axis is None:
+        padded, _, _ = _pad_sections(sections)
+        centroids = np.nanmean(padded, axis=1)
+        axis = centroids[-1] - centroids[0]
+        if not np.linalg.norm(axis) > 1e-9 * np.abs(centroids).max(initial=1.0):
+            axis = areas.sum(axis=0)
+
+    reverse = areas @ np.asarray(axis, dtype=float) < 0
+    oriented = [
+        np.roll(s[::-1], 1, axis=0) if r else s
+        for s, r in zip((np.asarray(s, dtype=float) for s in sections), reverse)
+    ]
+    le = blade_landmarks(oriented)['le_index']
+    return [np.roll(s, -i, axis=0) for s, i in zip(oriented, le)], reverse
+
+
+def _segment_crossings(start, end, section, index, counts, closed):
+    """
+    Counts proper crossings of non-adjacent segments of every section
+    :param start, end: (M, 2) segment ends in the section planes, the
+        first coordinate is along the longest extent of the section
+    :param section: (M,) section of every segment
+    :param index: (M,) segment number within its section
+    :param counts: (S,) point counts of the sections
+    :param closed: bool, if the last segment returns to the first point
+    :return: np.ndarray, (S,) number of crossings
+    """
+
+    # Candidate pairs overlap along the first coordinate: segments are
+    # sorted by their lower end, and every one is paired with the next
+    # ones starting before its upper end. Sections are kept apart by an
+    # offset of the normalized coordinates.
+    low, high = np.minimum(start[:, 0], end[:, 0]), np.maximum(start[:, 0], end[:, 0])
+    first = np.full(len(counts), np.inf)
+    last = np.full(len(counts), -np.inf)
+    np.minimum.at(first, section, low)
+    np.maximum.at(last, section, high)
+    scale = np.where(last > first, last - first, 1.0)
+    low = 2.0 * section + (low - first[section]) / scale[section]
+    high = 2.0 * section + (high - first[section]) / scale[section]
+
+    order = np.argsort(low, kind='stable')
+    position = np.arange(len(order))
+    stop = np.searchsorted(low[order], high[order], side='right')
+    n_pairs = np.maximum(stop - position - 1, 0)
+    offsets = np.cumsum(n_pairs) - n_pairs
+    a = np.repeat(order, n_pairs)
+    b = order[np.arange(n_pairs.sum()) - np.repeat(offsets, n_pairs) + np.repeat(position + 1, n_pairs)]
+
+    # Neighbours share a point
+    gap = np.abs(index[a] - index[b])
+    pair = gap > 1
+    if closed:
+        pair &= gap != counts[section[a]] - 1
+    a, b = a[pair], b[pair]
+
+    def cross(u, v):
+        return u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]
+
+    p0, p1, q0, q1 = start[a], end[a], start[b], end[b]
+    hit = (cross(q1 - q0, p0 - q0) * cross(q1 - q0, p1 - q0) < 0) & \
+          (cross(p1 - p0, q0 - p0) * cross(p1 - p0, q1 - p0) < 0)
+    return np.bincount(section[a[hit]], minlength=len(counts))
+
+
+def validate_sections(sections, degree=3, closed=True, tolerance=0.0, spacing_ratio=10.0):
+    """
+    Checks every section of a blade before NX splines are built from it
+
+    A section needs more points than the spline degree, no coincident
+    consecutive points and no crossing segments. A closing segment longer
+    than spacing_ratio times the median segment of its section and than
+    any other segment means the section is open. A segment longer than
+    spacing_ratio times the median one is a spacing outlier, a warning
+    only, since points are often clustered at the leading and trailing
+    edges.
+
+    :param sections: list of (N_i, 3) arrays, a closed section is given
+        without repeating its first point
+    :param degree: int, spline degree
+    :param closed: bool, if the last point is connected to the first one
+    :param tolerance: float, points closer than it are coincident
+    :param spacing_ratio: float, largest allowed ratio of a segment
+        length to the median one
+    :return: list, list
+        Messages of the errors and of the warnings found in every
+        section, empty lists for a valid one
+    """
+
+    problems = [[] for _ in sections]
+    warnings = [[] for _ in sections]
+    if not sections:
+        return problems, warnings
+    padded, mask, counts = _pad_sections(sections)
+
+    def report(found, message, messages=problems):
+        for s in np.flatnonzero(found):
+            messages[s].append(message(s))
+
+    # Other checks are of no use on sections with too few points
+    enough = counts > degree
+    report(~enough, lambda s: f'{counts[s]} points are not enough for degree {degree}.')
+    finite = np.isfinite(np.where(mask[..., None], padded, 0.0)).all(axis=(1, 2))
+    report(~finite, lambda s: 'Points are not finite.')
+    finite &= enough
+
+    # Segment lengths, the last one of a closed section returns to its start
+    rows = np.arange(len(padded))[:, None]
+    following = np.arange(1, padded.shape[1] + 1)
+    following = padded[rows, np.where(following < counts[:, None], following, 0)]
+    length = np.linalg.norm(following - padded, axis=2)
+    closing = length[rows[:, 0], counts - 1]
+    inner = mask & (np.arange(padded.shape[1]) < counts[:, None] - 1)
+    segments = inner | (mask & closed & (np.arange(padded.shape[1]) == counts[:, None] - 1))
+
+    duplicates = (np.where(segments, length, np.inf) <= tolerance).sum(axis=1)
+    report(enough & (duplicates > 0), lambda s: f'{duplicates[s]} coincident consecutive points.')
+
+    inner_length = np.where(inner, length, np.nan)
+    inner_length[~inner.any(axis=1), 0] = 0.0
+    median = np.nanmedian(inner_length, axis=1)
+    outliers = (np.where(inner, length, 0.0) > spacing_ratio * median[:, None]).sum(axis=1)
+    report(enough & (outliers > 0), lambda s: f'{outliers[s]} segments are longer than {spacing_ratio} median segments.',
+           warnings)
+    if closed:
+        longest = np.where(inner, length, 0.0).max(axis=1)
+        report(enough & (closing > spacing_ratio * median) & (closing > longest),
+               lambda s: f'Section is not closed, the gap is {closing[s]:.6g}.')
+
+    # Crossings are found in the best fit plane of every section, its
+    # axes are the principal directions of the points
+    centre = np.where(mask[..., None], padded, 0.0).sum(axis=1) / np.maximum(counts, 1)[:, None]
+    centred = np.nan_to_num(np.where(mask[..., None], padded - centre[:, None], 0.0))
+    values, vectors = np.linalg.eigh(np.einsum('snj,snk->sjk', centred, centred))
+    flat_section = finite & (values[:, 1] > 1e-18 * np.maximum(values[:, 2], 1e-300))
+    report(finite & ~flat_section, lambda s: 'Points are collinear.')
+
+    n_segments = np.where(flat_section, counts - (0 if closed else 1), 0)
+    section = np.repeat(np.arange(len(padded)), n_segments)
+    index = np.arange(n_segments.sum()) - np.repeat(np.cumsum(n_segments) - n_segments, n_segments)
+    following = np.where(index + 1 < counts[section], index + 1, 0)
+    axes = vectors[section][:, :, [2, 1]]
+    start = np.einsum('mk,mkj->mj', padded[section, index], axes)
+    end = np.einsum('mk,mkj->mj', padded[section, following], axes)
+    crossings = _segment_crossings(start, end, section, index, counts, closed)
+    report(crossings > 0, lambda s: f'Section intersects itself, {crossings[s]} segment crossings.')
+
+    return problems, warnings
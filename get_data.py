@@ -3,92 +3,176 @@
 import numpy as np
 import os
 import re
+import argparse
+import tempfile
 
+from concurrent.futures import ProcessPoolExecutor
 
-from common_class import CommonClass
 
-
-def invert_array(a):
-    s = np.empty(a.shape)
-    for i, v in enumerate(a):
-        s[i] = a[a.shape[0]-1-i:a.shape[0]-i:]
-    return s
+from common_class import FileIndex
+from array_cache import ArrayCache
+from blade_io import BLADE_EXT, write_airfoil_csv, write_airfoil_binary
+from geometry import Transform, unique_points
 
 
-def change_columns(a):
-    s = np.empty(a.shape)
-    for i, v in enumerate(a):
-        s[i] = [v[1], v[2], v[0]]
-    return s
+INVERT = Transform().reverse()
+CHANGE_COLUMNS = Transform().swap_axes((1, 2, 0))
 
 
-def get_unique_array(a):
+def invert_array(a):
+    return INVERT.apply(a)
 
-    temp = []
-    u, indices = np.unique(a, return_index=True, axis=0)
-    indices.sort()
-    for i in indices:
-        temp.append(list(a[i]))
 
-    return np.array(temp)
+def change_columns(a):
+    return CHANGE_COLUMNS.apply(a)
+
+
+def read_dat(file_name):
+    return np.genfromtxt(file_name, delimiter='\t', usecols=(0, 1, 2), dtype=None)
+
+
+def get_unique_array(a, tolerance=0.0):
+    index, _ = unique_points(a, tolerance)
+    return np.asarray(a)[index]
+
+
+SECTION_PATTERN = re.compile(r'section\d+')
+
+
+def flip_suction_side(ss_file, out_dir, cache):
+    """
+    Reverses suction side points and saves them as revert_<name> in out_dir
+    :param ss_file: str, suction side .dat file
+    :param out_dir: str, directory of the combined sections files
+    :param cache: ArrayCache
+    :return: str, written file name
+    """
+
+    data = invert_array(cache.load(ss_file, read_dat))
+    new_file = os.path.join(out_dir, f'revert_{os.path.split(ss_file)[1]}')
+    np.savetxt(new_file, data, delimiter='\t')
+    cache.store(new_file, data)
+    return new_file
+
+
+def combine_section(section_files, cache, tolerance=0.0):
+    """
+    Stacks PS and SS files of one section, swaps columns and removes duplicates
+    :param section_files: list of .dat files in stacking order
+    :param cache: ArrayCache
+    :param tolerance: float, distance below which points are merged
+    :return: np.ndarray (N, 3)
+    """
+
+    data = [cache.load(f, read_dat) for f in section_files]
+    data = data[0] if len(data) == 1 else np.vstack(data)
+    return get_unique_array(change_columns(data), tolerance)
+
+
+def _combine_section_to_file(section_files, cache, tolerance, out_file):
+    # Worker side of preprocess_sections: the result goes back through
+    # a memory-mapped .npy file, only its name is pickled
+    np.save(out_file, combine_section(section_files, cache, tolerance))
+    return out_file
+
+
+def preprocess_sections(airfoil_sections_dir, airfoil_file, **parameters):
+    """
+    Flips suction side files, combines PS and SS points of every
+    sectionN and writes the blade sections file
+    :param airfoil_sections_dir: str, directory with PS .dat files and
+        ss_airfoils subdirectory
+    :param airfoil_file: str, output sections file
+    :param parameters: dict
+        :parameter: workers: int=1 number of processes, sections are
+                    independent and spread across a process pool
+        :parameter: cache: ArrayCache=None parsed files cache
+        :parameter: tolerance: float=0.0 distance below which points are merged
+        :parameter: binary: bool=False if sections are also written to a .blade
+                    file, an existing one is removed otherwise
+    :return: dict, section name -> (N, 3) array
+    """
+
+    workers = parameters.get('workers', 1)
+    cache = parameters.get('cache', None) or ArrayCache(enabled=False)
+    tolerance = parameters.get('tolerance', 0.0)
+    binary = parameters.get('binary', False)
+
+    ss_airfoils_dir = os.path.join(airfoil_sections_dir, 'ss_airfoils')
+    index = FileIndex(airfoil_sections_dir)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+
+    try:
+        # Flip suction side coordinates
+        is_exist, ss_files = index.get_files(ss_airfoils_dir, ('.dat',))
+        if is_exist:
+            if executor:
+                n = len(ss_files)
+                flipped = list(executor.map(flip_suction_side, ss_files, [airfoil_sections_dir] * n, [cache] * n))
+            else:
+                flipped = [flip_suction_side(ss_file, airfoil_sections_dir, cache) for ss_file in ss_files]
+            # Written files are added by name, the directory time may
+            # not have changed yet
+            index.add(flipped)
+
+        # Group PS and SS files by section, flipped files have been added
+        is_exist, airfoils_data = index.get_files(airfoil_sections_dir, ('.dat',))
+        section_files = {}
+        if is_exist:
+            for airfoil in airfoils_data:
+                key = re.search(SECTION_PATTERN, os.path.split(airfoil)[1])[0]
+                section_files.setdefault(key, []).append(airfoil)
+
+        # Combine PS and SS coordinates
+        if executor:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                out_files = [os.path.join(tmp_dir, f'{key}.npy') for key in section_files]
+                n = len(out_files)
+                out_files = executor.map(
+                    _combine_section_to_file, section_files.values(),
+                    [cache] * n, [tolerance] * n, out_files
+                )
+                sections = {
+                    key: np.array(np.load(out_file, mmap_mode='r'))
+                    for key, out_file in zip(section_files, out_files)
+                }
+        else:
+            sections = {
+                key: combine_section(val, cache, tolerance)
+                for key, val in section_files.items()
+            }
+    finally:
+        if executor:
+            executor.shutdown()
+
+    write_airfoil_csv(airfoil_file, sections)
+    blade_file = os.path.splitext(airfoil_file)[0] + BLADE_EXT
+    if binary:
+        write_airfoil_binary(blade_file, sections)
+    elif os.path.isfile(blade_file):
+        # A binary file of earlier sections would be read instead of the text one
+        os.remove(blade_file)
+    return sections
 
 
 if __name__ == "__main__":
 
+    parser = argparse.ArgumentParser(description='Combine PS and SS airfoil sections')
+    parser.add_argument('--no-cache', action='store_true', help='parse every .dat file, skip the .npy cache')
+    parser.add_argument('--rebuild-cache', action='store_true', help='re-parse every .dat file and refresh the cache')
+    parser.add_argument('--binary', action='store_true', help='also write sections to a binary .blade file')
+    parser.add_argument('--tolerance', type=float, default=1e-9, help='distance below which points are merged')
+    parser.add_argument('--workers', type=int, default=1, help='number of preprocessing processes')
+    args = parser.parse_args()
+
+    cache = ArrayCache(enabled=not args.no_cache, rebuild=args.rebuild_cache)
+
     root_dir = os.getcwd()
     airfoil_sections_dir = r'airfoils'
     airfoil_sections_dir = os.path.join(root_dir, airfoil_sections_dir)
     airfoil_file = os.path.join(airfoil_sections_dir, 'b1', 'airfoil.dat')
 
-    prt_name = 'b1.prt'
-    prt_file = os.path.join(airfoil_sections_dir, 'prt', prt_name)
-
-    ps_airfoils_dir = 'ps_airfoils'
-    ss_airfoils_dir = 'ss_airfoils'
-
-    ps_airfoils_dir = os.path.join(airfoil_sections_dir, ps_airfoils_dir)
-    ss_airfoils_dir = os.path.join(airfoil_sections_dir, ss_airfoils_dir)
-
-    file_operate = CommonClass()
-
-    # Get suction side airfoils files
-    is_exist, airfoils_data = file_operate.get_files(ss_airfoils_dir, ('.dat',))
-
-    # Flip suction side coordinates
-    if is_exist:
-        for ss_airfoils in airfoils_data:
-            data = np.genfromtxt(ss_airfoils, delimiter='\t', usecols=(0, 1, 2), dtype=None)
-            data = invert_array(data)
-            new_file_name = f'revert_{os.path.split(ss_airfoils)[1]}'
-            new_file = os.path.join(airfoil_sections_dir, new_file_name)
-            np.savetxt(new_file, data, delimiter='\t')
-
-    is_exist, airfoils_data = file_operate.get_files(airfoil_sections_dir, ('.dat',))
-
-    sections = {}
-
-    # Combine PS and SS coordinates
-    pattern = re.compile(r'section\d')
-    if is_exist:
-        for airfoil in airfoils_data:
-            file_name = os.path.split(airfoil)[1]
-            key = re.search(pattern, file_name)[0]
-            data = np.genfromtxt(airfoil, delimiter='\t', usecols=(0, 1, 2), dtype=None)
-            if key not in sections.keys():
-                sections[key] = data
-            else:
-                sections[key] = np.vstack((sections[key], data))
-
-    # Flip airfoils coordinates
-    for key, val in sections.items():
-        sections[key] = change_columns(val)
-
-    if os.path.isfile(airfoil_file):
-        os.remove(airfoil_file)
-
-    with open(airfoil_file, 'a') as f:
-
-        for k, v in sections.items():
-            f.write(f'{k},,\n')
-            v = get_unique_array(v)
-            np.savetxt(f, v, delimiter=',')
+    preprocess_sections(
+        airfoil_sections_dir, airfoil_file, workers=args.workers, cache=cache,
+        tolerance=args.tolerance, binary=args.binary
+    )
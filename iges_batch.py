@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import traceback
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import nxopen_stub
+
+from common_class import FileIndex
+
+
+IGES_EXT = ('.igs', '.iges', '.IGS', '.IGES')
+METHODS = ('import', 'open')
+
+# NX wrapper of the current worker process
+_worker = {}
+
+
+def _init_worker(stub_latency):
+    """
+    Initializer of a worker process
+    :param stub_latency: float, latency of the stand-in NXOpen backend,
+        None uses the real NXOpen package
+    :return: None
+    """
+
+    if stub_latency is not None:
+        nxopen_stub.install(stub_latency)
+    _worker.clear()
+
+
+def _get_nx():
+    # NX session is kept for the next files
+    if 'nx' not in _worker:
+        from nx_class import NX
+
+        _worker['nx'] = NX()
+    return _worker['nx']
+
+
+def iges_files(sources):
+    """
+    :param sources: str or list, directories and IGES files
+    :return: list, naturally sorted IGES files of the directories and
+        the given files in their order
+    """
+
+    if isinstance(sources, str):
+        sources = [sources]
+    index = FileIndex()
+    files = []
+    for source in sources:
+        if os.path.isdir(source):
+            is_found, found = index.get_files(source, IGES_EXT)
+            if is_found:
+                files.extend(found)
+        else:
+            files.append(source)
+    return files
+
+
+def output_name(in_file, prt_dir):
+    return os.path.join(prt_dir, f'{os.path.splitext(os.path.split(in_file)[1])[0]}.prt')
+
+
+def is_up_to_date(in_file, out_file):
+    """
+    :return: Bool, True if out_file exists and is not older than in_file
+    """
+
+    try:
+        out_stat = os.stat(out_file)
+        return out_stat.st_size > 0 and out_stat.st_mtime_ns >= os.stat(in_file).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _convert(nx, in_file, out_file, method):
+    """
+    Converts one file, the part is written under a temporary name and
+    renamed when it is complete, so a broken conversion never leaves an
+    output that looks up to date
+    :return: Bool, str
+    """
+
+    tmp_file = f'{os.path.splitext(out_file)[0]}.{os.getpid()}.tmp.prt'
+    if method == 'import':
+        is_converted, msg = nx.import_iges(in_file, tmp_file)
+    else:
+        is_converted, msg = nx.create_prt_file(in_file, tmp_file, close_all=False) or (False, None)
+    if is_converted and os.path.isfile(tmp_file):
+        os.replace(tmp_file, out_file)
+        return True, f"File '{out_file}' has been converted from '{in_file}'."
+    if os.path.isfile(tmp_file):
+        os.remove(tmp_file)
+    return False, msg or f"File '{in_file}' has not been converted."
+
+
+def _convert_in_worker(in_file, out_file, method, attempt):
+    """
+    Converts one file in a worker process
+    :return: dict, file result
+    """
+
+    result = {
+        'file': in_file,
+        'part': out_file,
+        'success': False,
+        'message': '',
+        'attempts': attempt,
+        'pid': os.getpid(),
+        'time': 0.0
+    }
+    start = time.perf_counter()
+    try:
+        result['success'], result['message'] = _convert(_get_nx(), in_file, out_file, method)
+    except Exception as ex:
+        # The session may be broken, the next file opens a new one
+        _worker.pop('nx', None)
+        result['message'] = f"An error occurred: {str(ex)}\n{traceback.format_exc()}"
+    result['time'] = time.perf_counter() - start
+    return result
+
+
+def convert_files(sources, prt_dir, workers=2, retries=1, **parameters):
+    """
+    Converts IGES files to NX parts, files whose part is up to date are
+    skipped and failed files are converted again
+    :param sources: str or list, directories and IGES files
+    :param prt_dir: Directory of the converted parts
+    :param workers: int, number of worker processes with their own NX
+        sessions, 1 converts every file in this process
+    :param retries: int, number of conversions again of a failed file
+    :param method: str, 'import' uses an IGES importer per file,
+        'open' opens every file and saves it as a part
+    :param force: bool, if up to date parts are converted again
+    :param nx: NX, session of this process used with workers=1
+    :param stub_latency: float, workers use the stand-in NXOpen backend with
+        this latency, by default they do it if the stand-in is installed in
+        this process
+    :return: dict
+        Summary with numbers of files, converted, skipped and failed
+        files, wall time, converted files per second, failed file names
+        and results of every converted file with keys file, part,
+        success, message, attempts, pid and time
+    """
+
+    method = parameters.get('method', 'import')
+    if method not in METHODS:
+        raise ValueError(f"Method has to be one of {METHODS}.")
+    force = parameters.get('force', False)
+    stub_latency = parameters.get('stub_latency', None)
+    if stub_latency is None and nxopen_stub.is_installed():
+        stub_latency = nxopen_stub.STATS.latency
+    logger = logging.getLogger(__name__)
+
+    start = time.perf_counter()
+    files = iges_files(sources)
+    os.makedirs(prt_dir, exist_ok=True)
+    outputs = {f: output_name(f, prt_dir) for f in files}
+    pending = [f for f in files if force or not is_up_to_date(f, outputs[f])]
+    skipped = len(files) - len(pending)
+
+    results = {}
+    nx = None
+    executor = None
+    try:
+        for attempt in range(1, retries + 2):
+            if not pending:
+                break
+
+            if workers > 1:
+                if executor is None:
+                    executor = ProcessPoolExecutor(
+                        max_workers=min(workers, len(pending)), initializer=_init_worker,
+                        initargs=(stub_latency,)
+                    )
+                futures = {
+                    executor.submit(_convert_in_worker, f, outputs[f], method, attempt): f for f in pending
+                }
+                broken = False
+                for future in as_completed(futures):
+                    in_file = futures[future]
+                    try:
+                        results[in_file] = future.result()
+                    except BrokenProcessPool as ex:
+                        # A crashed NX session breaks the pool, it is started
+                        # again for the files which have to be converted
+                        broken = True
+                        results[in_file] = {
+                            'file': in_file, 'part': outputs[in_file], 'success': False,
+                            'message': f"Worker process has terminated: {str(ex)}",
+                            'attempts': attempt, 'pid': None, 'time': 0.0
+                        }
+                if broken:
+                    executor.shutdown()
+                    executor = None
+            else:
+                if nx is None:
+                    nx = parameters.get('nx', None)
+                    if nx is None:
+                        from nx_class import NX
+
+                        nx = NX()
+                for in_file in pending:
+                    file_start = time.perf_counter()
+                    try:
+                        is_converted, msg = _convert(nx, in_file, outputs[in_file], method)
+                    except Exception as ex:
+                        is_converted, msg = False, f"An error occurred: {str(ex)}"
+                    results[in_file] = {
+                        'file': in_file, 'part': outputs[in_file], 'success': is_converted,
+                        'message': msg, 'attempts': attempt, 'pid': os.getpid(),
+                        'time': time.perf_counter() - file_start
+                    }
+
+            pending = [f for f in pending if not results[f]['success']]
+            for in_file in pending:
+                logger.warning("Attempt %d of file '%s' has failed. %s", attempt, in_file, results[in_file]['message'])
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    wall_time = time.perf_counter() - start
+    converted = sum(r['success'] for r in results.values())
+    failed = [f for f in files if f in results and not results[f]['success']]
+    for in_file in failed:
+        logger.error("File '%s' has not been converted after %d attempts.", in_file, results[in_file]['attempts'])
+    return {
+        'files': len(files),
+        'converted': converted,
+        'skipped': skipped,
+        'failed': len(failed),
+        'time': wall_time,
+        'throughput': converted / wall_time if wall_time > 0 else 0.0,
+        'failed_files': failed,
+        'results': [results[f] for f in files if f in results]
+    }
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description='Convert IGES files to NX parts')
+    parser.add_argument('sources', nargs='+', help='IGES files or directories')
+    parser.add_argument('--prt-dir', required=True, help='directory of the converted parts')
+    parser.add_argument('--workers', type=int, default=2, help='number of NX worker processes')
+    parser.add_argument('--retries', type=int, default=1, help='conversions again of a failed file')
+    parser.add_argument('--method', choices=METHODS, default='import', help='IGES importer or open and save')
+    parser.add_argument('--force', action='store_true', help='convert up to date files again')
+    parser.add_argument('--stub', action='store_true', help='use the stand-in NXOpen backend')
+    parser.add_argument('--latency', type=float, default=0.0, help='stand-in NX API call latency, seconds')
+    parser.add_argument('--output', default=None, help='JSON summary file, printed if not set')
+    args = parser.parse_args()
+
+    if args.stub:
+        nxopen_stub.install(args.latency)
+    logging.basicConfig(stream=sys.stderr, level=logging.WARNING)
+
+    summary = convert_files(
+        args.sources, args.prt_dir, workers=args.workers, retries=args.retries,
+        method=args.method, force=args.force
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(summary, f, indent=2)
+    else:
+        print(json.dumps({key: val for key, val in summary.items() if key != 'results'}, indent=2))
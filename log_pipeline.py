@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+import json
+import queue
+import logging
+import logging.handlers
+
+from datetime import datetime
+
+
+# Structured fields of a record, passed to a logger call as extra
+FIELDS = ('blade', 'section', 'operation', 'duration', 'status')
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+
+def fields(record):
+    """
+    :param record: logging.LogRecord
+    :return: dict, structured fields set on the record
+    """
+
+    return {key: getattr(record, key) for key in FIELDS if getattr(record, key, None) is not None}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    Formats a record as one JSON object with time, level, logger,
+    message and the structured fields set on the record
+    """
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **fields(record)
+        }
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record):
+        # The queue stays in this process, records are formatted by the
+        # writer thread instead of the logging one
+        return record
+
+
+class LogPipeline:
+    """
+    A class sends records of the root logger through a queue to a file
+    handler run by a background thread, so a slow disk does not stall
+    the thread that logs
+
+    Records are formatted by the writer thread. Calls below the level
+    are dropped by the logger before any message is formatted.
+
+    ...
+    Methods
+    -------
+    start()
+        Attaches the queue handler to the root logger and starts the writer
+    stop()
+        Writes the queued records, detaches the handler and closes the file
+    """
+
+    def __init__(self, log_file, level=logging.WARNING, json_lines=False):
+        """
+        :param log_file: str, output file, records are appended
+        :param level: int, level of the root logger
+        :param json_lines: bool, if records are written as JSON lines,
+            plain text lines otherwise
+        """
+
+        self.log_file = log_file
+        self.level = level
+        self.json_lines = json_lines
+        self._queue = queue.SimpleQueue()
+        self._handler = _QueueHandler(self._queue)
+        self._file_handler = None
+        self._listener = None
+        self._level = None
+
+    def start(self):
+        if self._listener is not None:
+            return self
+        self._file_handler = logging.FileHandler(self.log_file, encoding='utf-8', delay=True)
+        self._file_handler.setFormatter(
+            JsonLinesFormatter() if self.json_lines else logging.Formatter(TEXT_FORMAT)
+        )
+        self._listener = logging.handlers.QueueListener(self._queue, self._file_handler)
+        self._listener.start()
+
+        root = logging.getLogger()
+        self._level = root.level
+        root.setLevel(self.level)
+        root.addHandler(self._handler)
+        return self
+
+    def stop(self):
+        if self._listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(self._handler)
+        root.setLevel(self._level)
+        self._listener.stop()
+        self._file_handler.close()
+        self._listener = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
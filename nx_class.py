@@ -1,11 +1,49 @@
 ﻿# -*- coding: utf-8 -*-
 
 import os
+import time
+import contextlib
+import numpy as np
 import NXOpen as Nx
+import NXOpen.UF as Uf
 import NXOpen.Features as Ftr
 
 from NXOpen import SectionCollection as SecCol
 
+from geometry import Transform, simplify_points
+from spline_fit import fit_bspline
+from nx_profiler import profiled, resident_memory
+
+
+# [x, y, z] -> [-y, 0, x]
+POINTS_CONVERSION = Transform().linear([[0, -1, 0], [0, 0, 0], [1, 0, 0]])
+
+# IGES importer settings, set on the importer of every file
+IGES_IMPORT = {
+    'CopiousData': Nx.IgesImporter.CopiousDataEnum.LinearNURBSpline,
+    'SmoothBSurf': True,
+    'LayerDefault': 10,
+    'FileOpenFlag': False,
+    'LayerMask': "0-99999"
+}
+
+
+def _points_count(args, kwargs):
+    points = kwargs.get('points')
+    return 0 if points is None else len(points)
+
+
+def _sections_count(args, kwargs):
+    return len(kwargs.get('sections') or {})
+
+
+def _one(args, kwargs):
+    return 1
+
+
+def _parts_count(args, kwargs):
+    return len(args[0] if args else kwargs.get('parts') or [])
+
 
 def points_list_converted(points):
     """
@@ -18,13 +56,29 @@ def points_list_converted(points):
         create_spline_from_points method of the NXAssembly class
     """
 
-    coordinates = []
-    for point in points:
-        x = (-1) * point[1]
-        y = 0
-        z = point[0]
-        coordinates.append([x, y, z])
-    return coordinates
+    return POINTS_CONVERSION.apply(points)
+
+
+class _BulkCreation:
+    """
+    State of an NX.bulk_creation block
+    """
+
+    def __init__(self, session, mark):
+        self.session = session
+        self.mark = mark
+        self.rolled_back = False
+        self.update_errors = 0
+
+    def rollback(self):
+        """
+        Undoes everything created in the block, the model is not updated at exit
+        :return: None
+        """
+
+        if not self.rolled_back:
+            self.session.UndoToMark(self.mark, None)
+            self.rolled_back = True
 
 
 class NX:
@@ -35,80 +89,255 @@ class NX:
     -------
     import_files(in_file=None, out_file=None, in_file_type='iges')
         Imports iges file and saves it to prt format
-    create_prt_file(iges_file: str, prt_dir: str)
+    import_iges(in_file: str, out_file: str)
+        Imports iges file to prt format with the IGES_IMPORT settings
+    create_prt_file(iges_file: str, prt_dir: str, close_all=True)
         Opens an iges file and saves it to the prt_dir folder
-    close_all(prt_file: str)
+    close_all(prt_file: str, save=True)
         Saves and closes all modified files
     create_new_nx_file(**parameters)
         Creates new NX prt file with the set parameters
     add_part_to_assembly(part, assembly_file=None)
         Adds prt file to an assembly file
+    add_parts_to_assembly(parts, assembly_file=None, placements=None)
+        Adds a list of prt files to an assembly file in one operation
+    set_load_options(**parameters)
+        Sets how component parts are loaded and which reference set they use
+    restore_load_options()
+        Sets the load options of the session back to the values before
+        set_load_options
     create_spline_with_points(**parameters)
         Creates studio spline object with the set parameters
     through_curves(**parameters)
         Creates solid or sheet body passing through curves with the set parameters
     swept(**parameters)
         Creates solid or sheet body with swept method with the set parameters
+    bulk_creation(name='Bulk creation')
+        Context manager, objects are created under one undo mark with
+        model updates and display refresh deferred to the block exit
     """
 
-    def __init__(self):
+    def __init__(self, profiler=None):
         """
         Constructs necessary attributes for handling NX Objects
 
+        One instance creates, builds and closes any number of parts,
+        session level objects are looked up once per instance
+
         :param self.session: A NX current session
-        :param self.new_file: A NXOpen NewFile Class for handling
-        new nx file
+        :param self.parts: The session parts collection
+        :param self.profiler: NXProfiler, if set every method call is
+        timed and the calls into NXOpen are counted
         """
 
+        self.profiler = profiler
         self.session = Nx.Session.GetSession()
-        self.new_file = self.session.Parts.FileNew()
+        if profiler:
+            profiler.count()
+            self.session = profiler.wrap(self.session)
+        self.parts = self.session.Parts
+
+        self._work_part = None
+        self._application = None
+        self._preferences = {}
+        self._property_groups = {}
+        self._uf_session = None
+        self._load_options = {}
+        self._saved_load_options = None
+        self._reference_set = 'Use Model'
+
+    def _get_work_part(self):
+        # The work part only changes when a part is created or all are closed
+        if self._work_part is None:
+            self._work_part = self.parts.Work
+        return self._work_part
+
+    def _reset_work_part(self):
+        # A new work part or closed parts may leave another application
+        self._work_part = None
+        self._application = None
+
+    def _set_properties(self, builder, properties):
+        """
+        Sets properties of a builder and of its nested objects
+        :param builder: NX builder object
+        :param properties: dict, dotted property path -> value, e.g.
+            'Spine.DistanceTolerance', every value is set, defaults of a
+            new builder depend on the NX customer defaults
+        :return: None
+        """
+
+        key = tuple(properties.items())
+        groups = self._property_groups.get(key)
+        if groups is None:
+            # Same settings of the next builders reuse the grouping
+            groups = {}
+            for path, value in properties.items():
+                parent, _, name = path.rpartition('.')
+                groups.setdefault(parent, []).append((name, value))
+            self._property_groups[key] = groups
+
+        # Every nested object is looked up once
+        objects = {'': builder}
+        for parent, values in groups.items():
+            prefix = ''
+            for attr in parent.split('.') if parent else ():
+                path = f'{prefix}.{attr}' if prefix else attr
+                if path not in objects:
+                    objects[path] = getattr(objects[prefix], attr)
+                prefix = path
+            for name, value in values:
+                setattr(objects[parent], name, value)
+
+    def _display(self):
+        if self._uf_session is None:
+            self._uf_session = Uf.UFSession.GetUFSession()
+            if self.profiler:
+                self.profiler.count()
+                self._uf_session = self.profiler.wrap(self._uf_session)
+        return self._uf_session.Disp
+
+    @contextlib.contextmanager
+    def bulk_creation(self, name='Bulk creation'):
+        """
+        Creates splines, sections and bodies of the block under one undo
+        mark, interpart updates and display refresh are deferred and the
+        model is updated once at exit
+
+        The block is undone if it raises, if rollback() has been called
+        or if the final update fails.
+
+        :param name: str, undo mark name
+        :return: _BulkCreation
+            rollback() undoes everything created in the block,
+            update_errors is the number of errors of the final update
+        """
+
+        session = self.session
+        mark = session.SetUndoMark(Nx.Session.MarkVisibility.Visible, name)
+        bulk = _BulkCreation(session, mark)
+
+        update_manager = session.UpdateManager
+        interpart_delay = update_manager.InterpartDelay
+        update_manager.InterpartDelay = True
+        display = self._display()
+        display.SetDisplay(Uf.UFConstants.UF_DISP_SUPPRESS_DISPLAY)
+        try:
+            yield bulk
+            if not bulk.rolled_back:
+                bulk.update_errors = update_manager.DoUpdate(mark)
+                if bulk.update_errors:
+                    bulk.rollback()
+        except Exception:
+            bulk.rollback()
+            raise
+        finally:
+            update_manager.InterpartDelay = interpart_delay
+            display.SetDisplay(Uf.UFConstants.UF_DISP_UNSUPPRESS_DISPLAY)
+            display.RegenerateDisplay()
+
+    def _switch_application(self, application):
+        if application != self._application:
+            self.session.ApplicationSwitchImmediate(application)
+            self._application = application
+
+    def _preference(self, group, name):
+        key = (group, name)
+        if key not in self._preferences:
+            self._preferences[key] = getattr(getattr(self.session.Preferences, group), name)
+        return self._preferences[key]
+
+    def _tagged_object(self, tag):
+        obj = Nx.TaggedObjectManager.GetTaggedObject(tag)
+        if self.profiler:
+            self.profiler.count()
+            obj = self.profiler.wrap(obj)
+        return obj
+
+    def _create_iges_importer(self):
+        iges_importer = self.session.DexManager.CreateIgesImporter()
+        for name, value in IGES_IMPORT.items():
+            setattr(iges_importer, name, value)
+        return iges_importer
+
+    def _import_iges(self, iges_importer, in_file, out_file):
+        iges_importer.InputFile = in_file
+        iges_importer.OutputFile = out_file
+        try:
+            iges_importer.Commit()
+            msg = f"Iges file {os.path.split(out_file)[1]} has " \
+                  f"been successfully imported."
+            msg += f"\nOutput file {out_file}"
+            return True, msg
+        except Nx.NXException as ex:
+            msg = f"Iges file {os.path.split(out_file)[1]} has not been imported."
+            msg += f"An error occurred: {str(ex)}."
+            return False, msg
 
+    @profiled(_one)
     def import_file(self, in_file=None, out_file=None, in_file_type='iges'):
         """
         Imports file iges format (or another type file) and saves it to prt format
         :param in_file: File that will be imported to new NX file (str)
         :param out_file: File in which in_file will be saved (str)
         :param in_file_type: Type of input file (str)
-        :return: Logging message (str)
-        """
-
-        if in_file:
-            if in_file_type == 'iges':
-                iges_importer = self.session.DexManager.CreateIgesImporter()
-                iges_importer.CopiousData = Nx.IgesImporter.CopiousDataEnum.LinearNURBSpline
-                iges_importer.SmoothBSurf = True
-                iges_importer.LayerDefault = 10
-                iges_importer.InputFile = in_file
-                iges_importer.OutputFile = out_file
-                iges_importer.FileOpenFlag = False
-                iges_importer.LayerMask = "0-99999"
-                try:
-                    iges_importer.Commit()
-                    iges_importer.Destroy()
-                    msg = f"Iges file {os.path.split(out_file)[1]} has " \
-                          f"been successfully imported."
-                    msg += f"\nOutput file {out_file}"
-                    return msg
-                except Nx.NXException as ex:
-                    msg = f"Iges file {os.path.split(out_file)[1]} has not been imported."
-                    msg += f"An error occurred: {str(ex)}."
-                    return msg
+        :return: Bool, str
+            True if file has been imported or False otherwise and logging message
+        """
+
+        if not in_file:
+            return False, "File has not been imported. No input file."
+        if in_file_type != 'iges':
+            return False, f"File {in_file} has not been imported. Type {in_file_type} is not supported."
+        iges_importer = self._create_iges_importer()
+        is_imported, msg = self._import_iges(iges_importer, in_file, out_file)
+        if is_imported:
+            iges_importer.Destroy()
+        return is_imported, msg
+
+    @profiled(_one)
+    def import_iges(self, in_file, out_file):
+        """
+        Imports iges file and saves it to prt format, every file gets a
+        new importer with the IGES_IMPORT settings which is destroyed
+        after its commit
+        :param in_file: Input iges file (str)
+        :param out_file: File in which in_file will be saved (str)
+        :return: Bool, str
+            True if file has been imported or False otherwise and logging message
+        """
 
-    def create_prt_file(self, igs_file: str, prt_dir: str):
+        iges_importer = self._create_iges_importer()
+        try:
+            return self._import_iges(iges_importer, in_file, out_file)
+        finally:
+            try:
+                iges_importer.Destroy()
+            except Nx.NXException:
+                pass
+
+    @profiled(_one)
+    def create_prt_file(self, igs_file: str, prt_dir: str, close_all=True):
 
         """
         Create new NX prt file from an iges file
         :param igs_file: Input iges file (str)
-        :param prt_dir: Full directory name in which prt file will be saved
+        :param prt_dir: Full directory name in which prt file will be saved,
+            or the full prt file name
+        :param close_all: Bool, if all parts of the session are closed,
+            otherwise only the created part is
         :return: Bool, str
             True if file has been created or False otherwise and logging message
         """
 
-        prt_file = os.path.splitext(os.path.split(igs_file)[1])[0] + '.prt'
-        prt_file = os.path.join(prt_dir, prt_file)
+        if os.path.splitext(prt_dir)[1] == '.prt':
+            prt_file = prt_dir
+        else:
+            prt_file = os.path.splitext(os.path.split(igs_file)[1])[0] + '.prt'
+            prt_file = os.path.join(prt_dir, prt_file)
 
         try:
-            base_part, part_load_status = self.session.Parts.OpenBase(igs_file)
+            base_part, part_load_status = self.parts.OpenBase(igs_file)
             part_load_status.Dispose()
         except Nx.NXException as ex:
             msg = f"Trying to open file '{igs_file}'. " + str(ex)
@@ -120,36 +349,47 @@ class NX:
                 part_save_status.Dispose()
                 msg = f"File '{prt_file}' has been successfully created."
                 close_modified = Nx.BasePart.CloseModified.CloseModified
-                self.session.Parts.CloseAll(close_modified, None)
+                if close_all:
+                    self.parts.CloseAll(close_modified, None)
+                    self._reset_work_part()
+                else:
+                    base_part.Close(Nx.BasePart.CloseWholeTree.TrueValue, close_modified, None)
                 return True, msg
             except Nx.NXException as ex:
                 msg = f"Trying to save '{os.path.split(prt_file)[1]}'. " + str(ex)
                 return False, msg
 
-    def close_all(self, prt_file):
+    @profiled()
+    def close_all(self, prt_file, save=True):
 
         """
         Closes all parts of NX Work Part Object
         :param prt_file: File that will be closed
+        :param save: Bool, if the work part is saved before it is closed,
+            modified parts are discarded otherwise
         :return: Bool, str
             True if file has been closed or False otherwise and logging message
         """
 
         whole_tree = Nx.BasePart.SaveComponents.TrueValue
         close_modified = Nx.BasePart.CloseAfterSave.FalseValue
-        work_part = self.session.Parts.Work
 
         try:
-            save_status = work_part.Save(whole_tree, close_modified)
-            save_status.Dispose()
-            self.session.Parts.CloseAll(Nx.BasePart.CloseModified.CloseModified, None)
-            work_part = Nx.Part.Null
-            msg = f"File {prt_file} has been successfully saved and closed."
+            if save:
+                save_status = self._get_work_part().Save(whole_tree, close_modified)
+                save_status.Dispose()
+            self.parts.CloseAll(Nx.BasePart.CloseModified.CloseModified, None)
+            self._reset_work_part()
+            if save:
+                msg = f"File {prt_file} has been successfully saved and closed."
+            else:
+                msg = f"File {prt_file} has been closed without saving."
             return True, msg
         except Nx.NXException as ex:
             msg = f"Trying to save and close file '{prt_file}'. An error occurred {str(ex)}."
             return False, msg
 
+    @profiled()
     def create_new_nx_file(self, **parameters):
 
         """
@@ -175,31 +415,212 @@ class NX:
         tmp_presentation_name = parameters.get('tmp_presentation_name', 'Model')
 
         if file_name:
-            self.new_file.NewFileName = file_name
-            self.new_file.TemplateFileName = template
-            self.new_file.ApplicationName = app_name
-            self.new_file.TemplatePresentationName = tmp_presentation_name
-
-            self.new_file.UseBlankTemplate = False
-            self.new_file.Units = Nx.Part.Units.Millimeters
-            self.new_file.RelationType = ""
-            self.new_file.TemplateType = Nx.FileNewTemplateType.Item
-            self.new_file.ItemType = ""
-            self.new_file.MasterFileName = ""
-
-            self.new_file.SetCanCreateAltrep(False)
+            # FileNew objects are single use, one is created per part
+            new_file = self.parts.FileNew()
+            new_file.NewFileName = file_name
+            new_file.TemplateFileName = template
+            new_file.ApplicationName = app_name
+            new_file.TemplatePresentationName = tmp_presentation_name
+
+            new_file.UseBlankTemplate = False
+            new_file.Units = Nx.Part.Units.Millimeters
+            new_file.RelationType = ""
+            new_file.TemplateType = Nx.FileNewTemplateType.Item
+            new_file.ItemType = ""
+            new_file.MasterFileName = ""
+
+            new_file.SetCanCreateAltrep(False)
 
             try:
-                nx_obj_file = self.new_file.Commit()
+                new_file.Commit()
+                self._reset_work_part()
                 file_name = os.path.split(file_name)[1]
                 msg = f"File '{file_name}' has been successfully created."
-                self.new_file.Destroy()
                 return True, msg
             except Nx.NXException as ex:
                 file_name = os.path.split(file_name)[1]
                 msg = f"File '{file_name}' has not been created. An error occurred: {str(ex)}"
                 return False, msg
+            finally:
+                new_file.Destroy()
+
+    def _add_components(self, parts, assembly_file, placements):
+        """
+        Adds parts to the work part assembly with one positioner network
+        and one solve, parts with the same placement are added by one
+        AddComponentBuilder
+        :return: list of (False or Tagged Object, logging message) of every part
+        """
+
+        self._switch_application("UG_APP_MODELING")
+
+        work_part = self._get_work_part()
+        component_pos = work_part.ComponentAssembly.Positioner
+        component_pos.ClearNetwork()
+        component_pos.BeginAssemblyConstraints()
+        allow_interpart_positioning = self._preference('Assemblies', 'InterpartPositioning')
+        component_network = component_pos.EstablishNetwork()
+        component_network.MoveObjectsState = True
+
+        results = [None] * len(parts)
+        groups = {}
+        for i, part in enumerate(parts):
+            placement = placements[i]
+            if placement is not None:
+                origin, orientation = placement
+                orientation = np.eye(3) if orientation is None else np.asarray(orientation, dtype=float)
+                placement = (tuple(np.asarray(origin, dtype=float)), tuple(orientation.ravel()))
+            # Open time and the change of resident memory are reported for
+            # every component, peak values hold for the whole process only
+            calls = self.profiler.nx_calls if self.profiler else 0
+            memory = resident_memory()
+            start = time.perf_counter()
+            try:
+                base_part, part_load_status = self.parts.Open(part)
+                part_load_status.Dispose()
+                error = None
+            except Nx.NXException as ex:
+                error = f"Error opening component {part}. " + str(ex)
+            open_time = time.perf_counter() - start
+            if memory is not None:
+                memory = resident_memory() - memory
+            if self.profiler:
+                self.profiler.record(
+                    'open_component', open_time, self.profiler.nx_calls - calls, 1,
+                    error is None, error or part, memory
+                )
+            if error:
+                results[i] = False, error
+                continue
+            stats = f" Opened in {open_time:.3f} s, " + (
+                f"resident memory {memory / 2 ** 20:+.1f} MB." if memory is not None
+                else "resident memory unavailable, psutil is not installed.")
+            groups.setdefault(placement, []).append((i, base_part, stats))
+
+        builders = []
+        for placement, group in groups.items():
+            component_builder = work_part.AssemblyManager.CreateAddComponentBuilder()
+            if placement is None:
+                component_builder.SetInitialLocationType(
+                    Nx.Assemblies.AddComponentBuilder.LocationType.WorkPartAbsolute
+                )
+            else:
+                component_builder.SetInitialLocationType(
+                    Nx.Assemblies.AddComponentBuilder.LocationType.Absolute
+                )
+                component_builder.SetInitialLocationAndOrientation(
+                    Nx.Point3d(*placement[0]), Nx.Matrix3x3(*placement[1])
+                )
+            component_builder.SetComponentAnchor(
+                Nx.Assemblies.ProductInterface.InterfaceObject.Null
+            )
+            component_builder.Layer = 10
+            component_builder.ReferenceSet = self._reference_set
+            # Components of several parts are named after their parts
+            if len(group) == 1:
+                component_builder.ComponentName = os.path.splitext(os.path.split(parts[group[0][0]])[1])[0]
+            component_builder.SetPartsToAdd([base_part for _, base_part, _ in group])
+            builders.append((component_builder, group))
+
+        component_network.Solve()
+        work_part.AssignPermanentName(assembly_file)
+
+        for component_builder, group in builders:
+            try:
+                nx_obj_builder = component_builder.Commit()
+                obj_tag = nx_obj_builder.Tag
+                for i, _, stats in group:
+                    results[i] = obj_tag, f"Part {parts[i]} has been successfully added." + stats
+            except Nx.NXException as ex:
+                for i, _, _ in group:
+                    results[i] = False, f"Error committing component {parts[i]}. " + str(ex)
+            finally:
+                component_builder.Destroy()
+        component_pos.ClearNetwork()
+        return results
+
+    @profiled()
+    def set_load_options(self, **parameters):
+
+        """
+        Sets how parts opened as assembly components are loaded, only
+        the options that differ from the current ones are sent to NX
+
+        The options belong to the session, the values before the first
+        call are kept for restore_load_options.
+
+        :param partial_loading: Bool,
+            Loads only the data of components needed for display
+        :param lightweight: Bool,
+            Uses lightweight representations of components
+        :param reference_set: str,
+            Reference set of added components and the first default
+            reference set of loaded ones, 'Use Model' by default
+        :return: Bool and logging message
+        """
+
+        options = {
+            'UsePartialLoading': parameters.get('partial_loading', False),
+            'UseLightweightRepresentations': parameters.get('lightweight', False)
+        }
+        reference_set = parameters.get('reference_set', None) or 'Use Model'
 
+        try:
+            load_options = self.parts.LoadOptions
+            if self._saved_load_options is None:
+                self._saved_load_options = (
+                    load_options.UsePartialLoading, load_options.UseLightweightRepresentations,
+                    list(load_options.GetDefaultReferenceSets()), self._reference_set
+                )
+            for name, value in options.items():
+                if self._load_options.get(name) != value:
+                    setattr(load_options, name, value)
+                    self._load_options[name] = value
+            if self._load_options.get('DefaultReferenceSets') != reference_set:
+                load_options.SetDefaultReferenceSets(
+                    [reference_set] if reference_set == 'Entire Part' else [reference_set, 'Entire Part']
+                )
+                self._load_options['DefaultReferenceSets'] = reference_set
+        except Nx.NXException as ex:
+            return False, f"Load options have not been set. An error occurred: {str(ex)}"
+
+        self._reference_set = reference_set
+        return True, (
+            f"Load options: partial loading {options['UsePartialLoading']}, "
+            f"lightweight {options['UseLightweightRepresentations']}, reference set '{reference_set}'."
+        )
+
+    @profiled()
+    def restore_load_options(self):
+
+        """
+        Sets the load options of the session back to the values they had
+        before the first set_load_options call
+        :return: Bool and logging message
+        """
+
+        if self._saved_load_options is None:
+            return True, "Load options have not been changed."
+        partial_loading, lightweight, reference_sets, reference_set = self._saved_load_options
+
+        # Options sent later are compared with the restored ones
+        self._load_options = {}
+        try:
+            load_options = self.parts.LoadOptions
+            load_options.UsePartialLoading = partial_loading
+            load_options.UseLightweightRepresentations = lightweight
+            load_options.SetDefaultReferenceSets(reference_sets)
+        except Nx.NXException as ex:
+            return False, f"Load options have not been restored. An error occurred: {str(ex)}"
+
+        self._saved_load_options = None
+        self._reference_set = reference_set
+        return True, (
+            f"Load options have been restored: partial loading {partial_loading}, "
+            f"lightweight {lightweight}, reference sets {reference_sets}."
+        )
+
+    @profiled(_one)
     def add_part_to_assembly(self, part, assembly_file=None):
 
         """
@@ -213,47 +634,47 @@ class NX:
         """
 
         if assembly_file:
-            self.session.ApplicationSwitchImmediate("UG_APP_MODELING")
+            return self._add_components([part], assembly_file, [None])[0]
 
-            work_part = self.session.Parts.Work
-            component_name = os.path.splitext(os.path.split(part)[1])[0]
-            component_builder = work_part.AssemblyManager.CreateAddComponentBuilder()
-            component_pos = work_part.ComponentAssembly.Positioner
-            component_pos.ClearNetwork()
-            component_pos.BeginAssemblyConstraints()
-            allow_interpart_positioning = self.session.Preferences.Assemblies.InterpartPositioning
-            component_network = component_pos.EstablishNetwork()
-            component_network.MoveObjectsState = True
-            component_builder.SetInitialLocationType(
-                Nx.Assemblies.AddComponentBuilder.LocationType.WorkPartAbsolute
-            )
-            component_builder.SetComponentAnchor(
-                Nx.Assemblies.ProductInterface.InterfaceObject.Null
-            )
-            component_builder.Layer = 10
-            component_builder.ReferenceSet = "Use Model"
-            component_builder.ComponentName = component_name
-
-            base_part, part_load_status = self.session.Parts.Open(part)
-            part_load_status.Dispose()
-
-            part_to_use = [Nx.BasePart.Null] * 1
-            part_to_use[0] = base_part
-            component_builder.SetPartsToAdd(part_to_use)
-            component_network.Solve()
-            work_part.AssignPermanentName(assembly_file)
+    @profiled(_parts_count)
+    def add_parts_to_assembly(self, parts, assembly_file=None, placements=None):
 
-            try:
-                nx_obj_builder = component_builder.Commit()
-                obj_tag = nx_obj_builder.Tag
-                component_builder.Destroy()
-                component_pos.ClearNetwork()
-                msg = f"Part {part} has been successfully added."
-                return obj_tag, msg
-            except Nx.NXException as ex:
-                msg = f"Error committing component {part}. " + str(ex)
-                return False, msg
+        """
+        Adds a list of parts to an assembly in one operation, all parts
+        share one positioner network and one solve, and parts with the
+        same placement are added with one commit
+        :param parts: list of str,
+            Full part file names which are being added
+        :param assembly_file: str,
+            Full assembly file name in which parts are being added
+        :param placements: list or dict,
+            (origin, orientation) of every part, or of the parts given as
+            dict keys, origin is [x, y, z] in part units and orientation
+            is a 3x3 matrix with rows X, Y, Z or None. A part without a
+            placement is added at the work part absolute origin
+        Parts are loaded and referenced as set by set_load_options
+        :return: Bool and list
+            True if every part has been added or False otherwise, and
+            (part, False or Tagged Object, logging message) of every part
+        """
 
+        if not assembly_file:
+            return False, []
+        parts = list(parts)
+        if isinstance(placements, dict):
+            placements = [placements.get(part) for part in parts]
+        elif placements is None:
+            placements = [None] * len(parts)
+        if len(placements) != len(parts):
+            return False, [(part, False, "Placements do not match parts.") for part in parts]
+        if not parts:
+            return True, []
+
+        results = self._add_components(parts, assembly_file, placements)
+        results = [(part, tag, msg) for part, (tag, msg) in zip(parts, results)]
+        return all(tag is not False for _, tag, _ in results), results
+
+    @profiled(_points_count)
     def create_spline_with_points(self, **parameters):
 
         """
@@ -272,6 +693,16 @@ class NX:
             Can take two values ThroughPoints or ByPoles
         :param closed_spline: Bool,
             If spline has to be closed or not
+        :param max_deviation: float,
+            If set, points are reduced before any NX call so that the
+            dropped points stay within this chordal tolerance (after
+            units converting) of the spline through the kept points,
+            of the polyline through them for ByPoles splines
+        :param fit_tolerance: float,
+            If set, a B-spline is fitted to the points within this
+            tolerance (after units converting) and created ByPoles from
+            its poles, max_deviation is not used then. If the fit is not
+            within this tolerance, the spline goes through all points
         :return: False or Tagged object and logging message
         """
 
@@ -282,9 +713,45 @@ class NX:
         spline_type = parameters.get('spline_type', 'ThroughPoints')
         closed_spline = parameters.get('closed_spline', True)
         name = parameters.get('name', False)
+        max_deviation = parameters.get('max_deviation', None)
+        fit_tolerance = parameters.get('fit_tolerance', None)
+
+        if curve_points is not None and len(curve_points):
+            try:
+                curve_points = np.asarray(curve_points, dtype=float)[:, :3]
+            except (ValueError, TypeError):
+                msg = "Coordinates values can not be converted to float. "
+                msg += "Data type mismatches."
+                return False, msg
+            curve_points = Transform().scale(coeff).apply(curve_points)
 
-        if curve_points:
-            work_part = self.session.Parts.Work
+            dropped = 0
+            fitted = None
+            if fit_tolerance:
+                # Poles of the fitted spline are sent instead of the points
+                try:
+                    poles, deviation = fit_bspline(
+                        curve_points, spline_degree, closed_spline, tolerance=fit_tolerance
+                    )
+                except ValueError as ex:
+                    msg = f"Studio spline has not been created. {str(ex)}"
+                    return False, msg
+                # A spline out of tolerance is not created ByPoles, it
+                # goes through the points instead
+                fitted = len(curve_points), deviation
+                if deviation <= fit_tolerance:
+                    curve_points = poles
+                    spline_type = 'ByPoles'
+            elif max_deviation:
+                kept = simplify_points(
+                    curve_points, max_deviation, closed_spline,
+                    degree=spline_degree if spline_type == 'ThroughPoints' else None
+                )
+                if len(kept) > spline_degree:
+                    dropped = len(curve_points) - len(kept)
+                    curve_points = curve_points[kept]
+
+            work_part = self._get_work_part()
             studio_spline_builder = work_part.Features.CreateStudioSplineBuilderEx(Nx.NXObject.Null)
 
             if matched_knot:
@@ -302,24 +769,14 @@ class NX:
             studio_spline_builder.Degree = spline_degree
             studio_spline_builder.IsPeriodic = closed_spline
 
-            for point in curve_points:
-                x, y, z = point[0], point[1], point[2]
-
-                try:
-                    x, y, z = float(x), float(y), float(z)
-                    x *= coeff
-                    y *= coeff
-                    z *= coeff
-                except ValueError:
-                    msg = f"Coordinates value x: {x}, y: {y}, z: {z}. "
-                    msg += "Data type mismatches."
-                    return False, msg
-
+            points_collection = work_part.Points
+            constraint_manager = studio_spline_builder.ConstraintManager
+            for x, y, z in curve_points.tolist():
                 coordinates = Nx.Point3d(x, y, z)
-                spline_point = work_part.Points.CreatePoint(coordinates)
-                geometric_constraint_data = studio_spline_builder.ConstraintManager.CreateGeometricConstraintData()
+                spline_point = points_collection.CreatePoint(coordinates)
+                geometric_constraint_data = constraint_manager.CreateGeometricConstraintData()
                 geometric_constraint_data.Point = spline_point
-                studio_spline_builder.ConstraintManager.Append(geometric_constraint_data)
+                constraint_manager.Append(geometric_constraint_data)
             try:
                 nx_object = studio_spline_builder.Commit()
                 obj_tag = nx_object.Tag
@@ -331,11 +788,21 @@ class NX:
 
                 studio_spline_builder.Destroy()
                 msg = f"Studio spline has been successfully created."
+                if fitted and spline_type == 'ByPoles':
+                    msg += f" {len(curve_points)} poles fitted to {fitted[0]} points, deviation {fitted[1]:.3g}."
+                elif fitted:
+                    msg += f" Fit deviation {fitted[1]:.3g} is above the tolerance, spline goes through the points."
+                elif max_deviation:
+                    msg += f" {dropped} of {len(curve_points) + dropped} points dropped."
                 return obj_tag, msg
             except Nx.NXException as ex:
                 msg = f"Studio spline has not been created. An error occurred {str(ex)}."
                 return False, msg
+        else:
+            msg = "Studio spline has not been created. No curve points."
+            return False, msg
 
+    @profiled(_sections_count)
     def through_curves(self, **parameters):
 
         """
@@ -344,7 +811,8 @@ class NX:
             :parameter: section_curves: curves tags dict
             :parameter: preserve_shape: bool allows to keep shape edges
             :parameter: help_points: list of helping points for the constraint
-            :parameter: check_direction: bool is the directions of all sections should be checked
+            :parameter: check_directions: bool is the directions of all sections should be checked
+                        in NX, points oriented by geometry.orient_sections do not need it
             :parameter: surface_type: str ThroughCurves object or StudioSurface object
                         need to be created
             :parameter: distance_tolerance: float=0.01 sets the distance tolerance
@@ -364,20 +832,24 @@ class NX:
         angle_tolerance = parameters.get('angle_tolerance', 0.5)
 
         if section_curves:
-            work_part = self.session.Parts.Work
-            self.session.Preferences.Modeling.BodyType
+            work_part = self._get_work_part()
+            self._preference('Modeling', 'BodyType')
             if surface_type == 'studio_surface':
                 builder = work_part.Features.CreateStudioSurfaceBuilder(Ftr.Feature.Null)
-                builder.AlignmentMethod.AlignCurve.DistanceTolerance = distance_tolerance
-                builder.AlignmentMethod.AlignCurve.ChainingTolerance = chaining_tolerance
-                builder.AlignmentMethod.AlignCurve.AngleTolerance = angle_tolerance
+                self._set_properties(builder, {
+                    'AlignmentMethod.AlignCurve.DistanceTolerance': distance_tolerance,
+                    'AlignmentMethod.AlignCurve.ChainingTolerance': chaining_tolerance,
+                    'AlignmentMethod.AlignCurve.AngleTolerance': angle_tolerance
+                })
             elif surface_type == 'through_curves':
                 builder = work_part.Features.CreateThroughCurvesBuilder(Ftr.Feature.Null)
                 builder.PreserveShape = preserve_shape
                 builder.PatchType = Nx.Features.ThroughCurvesBuilder.PatchTypes.Multiple
-                builder.Alignment.AlignCurve.DistanceTolerance = distance_tolerance
-                builder.Alignment.AlignCurve.ChainingTolerance = chaining_tolerance
-                builder.Alignment.AlignCurve.AngleTolerance = angle_tolerance
+                self._set_properties(builder, {
+                    'Alignment.AlignCurve.DistanceTolerance': distance_tolerance,
+                    'Alignment.AlignCurve.ChainingTolerance': chaining_tolerance,
+                    'Alignment.AlignCurve.AngleTolerance': angle_tolerance
+                })
             else:
                 builder = work_part.Features.CreateStudioSurfaceBuilder(Ftr.Feature.Null)
 
@@ -387,7 +859,7 @@ class NX:
             # Set features
             for i, obj in enumerate(section_curves.values()):
 
-                studio_spline = Nx.TaggedObjectManager.GetTaggedObject(obj)
+                studio_spline = self._tagged_object(obj)
                 spline = studio_spline.GetEntities()[0]
                 help_point = Nx.Point3d(*help_points[i])
 
@@ -405,10 +877,10 @@ class NX:
                     rule, spline, Nx.NXObject.Null, Nx.NXObject.Null,
                     help_point, Nx.Section.Mode.Create, False
                 )
-                direction = section.GetStartAndDirection()
-
-                # Set same direction for all sections
+                # Set same direction for all sections, not needed for
+                # points ordered by geometry.orient_sections
                 if check_directions:
+                    direction = section.GetStartAndDirection()
                     if direction[2].X < 0:
                         section.ReverseDirection()
 
@@ -435,6 +907,7 @@ class NX:
                 msg = 'Through curves object has not been created. An error occurred: {ex}'
                 return False, msg
 
+    @profiled(_sections_count)
     def swept(self, **parameters):
 
         """
@@ -445,6 +918,8 @@ class NX:
             :parameter: section_help_points: list of section help points for the constrain
             :parameter: guide_help_points: list of guide help points for the constrain
             :parameter: preserve_shape: bool allows to keep shape edges
+            :parameter: check_directions: bool is the directions of all sections should be checked
+                        in NX, points oriented by geometry.orient_sections do not need it
             :parameter: distance tolerance: float=0.01 sets the distance tolerance
             :parameter: chaining_tolerance: float=0.0095 sets the chaining tolerance
             :parameter: g0_tolerance: float=0.01 sets the G0 (Position) tolerance
@@ -457,6 +932,7 @@ class NX:
         section_help_points = parameters.get('section_help_points', None)
         guide_help_points = parameters.get('guide_help_points', None)
         preserve_shape = parameters.get('preserve_shape', False)
+        check_directions = parameters.get('check_directions', False)
 
         distance_tolerance = parameters.get('distance_tolerance', 0.01)
         chaining_tolerance = parameters.get('chaining_tolerance', 0.0095)
@@ -465,56 +941,32 @@ class NX:
         g1_tolerance = parameters.get('g1', 0.5)
 
         if section_curves and guide_curves:
-            work_part = self.session.Parts.Work
-            self.session.Preferences.Modeling.BodyType
+            work_part = self._get_work_part()
+            self._preference('Modeling', 'BodyType')
 
             # Create object of SweptBuilder class
             builder = work_part.Features.CreateSweptBuilder(Ftr.Swept.Null)
-            builder.G0Tolerance = g0_tolerance
-            builder.G1Tolerance = g1_tolerance
             builder.PreserveShapeOption = preserve_shape
 
-            # Spine tolerances
-            builder.Spine.DistanceTolerance = distance_tolerance
-            builder.Spine.ChainingTolerance = chaining_tolerance
-            builder.Spine.AngleTolerance = angle_tolerance
-
-            builder.OrientationMethod.AngularLaw.AlongSpineData.Spine.DistanceTolerance = distance_tolerance
-            builder.OrientationMethod.AngularLaw.AlongSpineData.Spine.ChainingTolerance = chaining_tolerance
-            builder.OrientationMethod.AngularLaw.AlongSpineData.Spine.AngleTolerance = angle_tolerance
-
-            builder.ScalingMethod.AreaLaw.AlongSpineData.Spine.DistanceTolerance = distance_tolerance
-            builder.ScalingMethod.AreaLaw.AlongSpineData.Spine.ChainingTolerance = chaining_tolerance
-            builder.ScalingMethod.AreaLaw.AlongSpineData.Spine.AngleTolerance = angle_tolerance
-
-            builder.ScalingMethod.PerimeterLaw.AlongSpineData.Spine.DistanceTolerance = distance_tolerance
-            builder.ScalingMethod.PerimeterLaw.AlongSpineData.Spine.ChainingTolerance = chaining_tolerance
-            builder.ScalingMethod.PerimeterLaw.AlongSpineData.Spine.AngleTolerance = angle_tolerance
-
-            # Section tolerances
-            builder.AlignmentMethod.AlignCurve.DistanceTolerance = distance_tolerance
-            builder.AlignmentMethod.AlignCurve.ChainingTolerance = chaining_tolerance
-            builder.AlignmentMethod.AlignCurve.AngleTolerance = angle_tolerance
-
-            builder.OrientationMethod.OrientationCurve.DistanceTolerance = distance_tolerance
-            builder.OrientationMethod.OrientationCurve.ChainingTolerance = chaining_tolerance
-            builder.OrientationMethod.OrientationCurve.AngleTolerance = angle_tolerance
-
-            builder.OrientationMethod.AngularLaw.LawCurve.DistanceTolerance = distance_tolerance
-            builder.OrientationMethod.AngularLaw.LawCurve.ChainingTolerance = chaining_tolerance
-            builder.OrientationMethod.AngularLaw.LawCurve.AngleTolerance = angle_tolerance
-
-            builder.ScalingMethod.AreaLaw.LawCurve.DistanceTolerance = distance_tolerance
-            builder.ScalingMethod.AreaLaw.LawCurve.ChainingTolerance = chaining_tolerance
-            builder.ScalingMethod.AreaLaw.LawCurve.AngleTolerance = angle_tolerance
-
-            builder.ScalingMethod.ScalingCurve.DistanceTolerance = distance_tolerance
-            builder.ScalingMethod.ScalingCurve.ChainingTolerance = chaining_tolerance
-            builder.ScalingMethod.ScalingCurve.AngleTolerance = angle_tolerance
-
-            builder.ScalingMethod.PerimeterLaw.LawCurve.DistanceTolerance = distance_tolerance
-            builder.ScalingMethod.PerimeterLaw.LawCurve.ChainingTolerance = chaining_tolerance
-            builder.ScalingMethod.PerimeterLaw.LawCurve.AngleTolerance = angle_tolerance
+            # Spine, section and law curve tolerances
+            curves = (
+                'Spine',
+                'OrientationMethod.AngularLaw.AlongSpineData.Spine',
+                'ScalingMethod.AreaLaw.AlongSpineData.Spine',
+                'ScalingMethod.PerimeterLaw.AlongSpineData.Spine',
+                'AlignmentMethod.AlignCurve',
+                'OrientationMethod.OrientationCurve',
+                'OrientationMethod.AngularLaw.LawCurve',
+                'ScalingMethod.AreaLaw.LawCurve',
+                'ScalingMethod.ScalingCurve',
+                'ScalingMethod.PerimeterLaw.LawCurve'
+            )
+            properties = {'G0Tolerance': g0_tolerance, 'G1Tolerance': g1_tolerance}
+            for curve in curves:
+                properties[f'{curve}.DistanceTolerance'] = distance_tolerance
+                properties[f'{curve}.ChainingTolerance'] = chaining_tolerance
+                properties[f'{curve}.AngleTolerance'] = angle_tolerance
+            self._set_properties(builder, properties)
 
             # Create features, section and guide curves
             features = [Ftr.Feature.Null] * len(section_curves)
@@ -523,7 +975,7 @@ class NX:
 
             # Setting sections
             for i, obj in enumerate(section_curves.values()):
-                studio_spline = Nx.TaggedObjectManager.GetTaggedObject(obj)
+                studio_spline = self._tagged_object(obj)
                 spline = studio_spline.GetEntities()[0]
                 help_point = Nx.Point3d(*section_help_points[i])
                 feature = [Ftr.Feature.Null] * 1
@@ -540,13 +992,17 @@ class NX:
                     rule, spline, Nx.NXObject.Null, Nx.NXObject.Null,
                     help_point, Nx.Section.Mode.Create, False
                 )
+                if check_directions:
+                    direction = section.GetStartAndDirection()
+                    if direction[2].X < 0:
+                        section.ReverseDirection()
                 builder.SectionList.Append(section)
                 sections[i] = section
 
             # Setting guide curves
             for i, obj in enumerate(guide_curves.values()):
 
-                guide_spline = Nx.TaggedObjectManager.GetTaggedObject(obj)
+                guide_spline = self._tagged_object(obj)
                 spline = guide_spline.GetEntities()[0]
                 help_point = Nx.Point3d(*guide_help_points[i])
                 feature = [Ftr.Feature.Null] * 1
@@ -581,3 +1037,6 @@ class NX:
             except Nx.NXException as ex:
                 msg = f'Swept object has not been created. An error occured {str(ex)}'
                 return False, msg
+        else:
+            msg = 'Swept object has not been created. No section or guide curves.'
+            return False, msg
@@ -1,192 +1,382 @@
 # -*- coding: utf-8 -*-
 
 import os
-import csv
+import time
 import logging
 
 
 from nx_class import NX
-from common_class import CommonClass
+from geometry import GUIDE_STATIONS, guide_curves, orient_sections, validate_sections
+from common_class import CommonClass, FileIndex
+from build_farm import build_blades, emit_logs
+from build_manifest import BuildManifest
+from feature_plan import FeaturePlan, execute_plan
+from blade_io import BLADE_EXT, SectionsCache, read_airfoil, prefer_binary
+from log_pipeline import LogPipeline, TEXT_FORMAT
+
+
+# Parameters of blade part features, they are a part of the build
+# manifest digest, so a change here rebuilds every blade
+SECTION_SPLINE = {
+    'degree': 2,
+    'coeff': 1000,
+    'closed_spline': True,
+    'spline_type': 'ThroughPoints',
+    'matched_knot': True
+}
+GUIDE_SPLINE = {**SECTION_SPLINE, 'closed_spline': False}
+SWEPT = {
+    'preserve_shape': False,
+    'check_directions': False,
+    'distance_tolerance': 0.01,
+    'chaining_tolerance': 0.0095,
+    'angle_tolerance': 0.5,
+    'g0': 0.01,
+    'g1': 0.5
+}
+
+# Load options of create_assembly to add blade parts without loading
+# them fully
+ASSEMBLY_LOAD = {
+    'partial_loading': True,
+    'lightweight': True,
+    'reference_set': 'Use Model'
+}
+
+
+def build_parameters(coeff=1, max_deviation=None, fit_tolerance=None):
+    """
+    :return: dict, every parameter a blade part depends on besides its airfoil
+    """
+
+    return {
+        'section_spline': SECTION_SPLINE,
+        'guide_spline': GUIDE_SPLINE,
+        'swept': SWEPT,
+        'guide_stations': GUIDE_STATIONS,
+        'oriented': True,
+        'coeff': coeff,
+        'max_deviation': max_deviation,
+        'fit_tolerance': fit_tolerance
+    }
+
+
+def validate_airfoil(airfoil):
+    """
+    Checks blade sections before any NX part is opened, see
+    geometry.validate_sections
+    :param airfoil: dict, section name -> (N, 3) points
+    :return: Bool, list, list
+        True if a blade can be built or False otherwise, messages of
+        every problem found and warnings which do not stop the build
+    """
+
+    errors = []
+    degree = GUIDE_SPLINE['degree']
+    if len(airfoil) <= degree:
+        errors.append(f'{len(airfoil)} sections are not enough for guides of degree {degree}.')
+    problems, warnings = validate_sections(list(airfoil.values()), degree=SECTION_SPLINE['degree'],
+                                           closed=SECTION_SPLINE['closed_spline'])
+    for key, messages in zip(airfoil, problems):
+        errors.extend(f'Section {key}: {message}' for message in messages)
+    warnings = [f'Section {key}: {message}' for key, messages in zip(airfoil, warnings) for message in messages]
+    return not errors, errors, warnings
+
+
+def blade_name(file_):
+    return os.path.splitext(os.path.split(file_)[1])[0]
+
+
+def part_name(file_, prt_dir):
+    return os.path.join(prt_dir, f'{blade_name(file_)}.prt')
+
+
+def build_blade(nx, file_, prt_dir, coeff=1, max_deviation=None, sections_cache=None, logger=None,
+                airfoil=None, fit_tolerance=None):
+
+    """
+    Creates one blade part: section splines, guide splines and swept body
+    :param nx: NX, wrapper of the NX session
+    :param file_: Airfoil .blade or .csv file
+    :param prt_dir: Directory of blade parts
+    :param coeff: Convert to mm
+    :param max_deviation: Chordal tolerance in mm for reducing spline points,
+        None keeps every point
+    :param sections_cache: SectionsCache for CSV files
+    :param logger: logging.Logger, messages of every step
+    :param airfoil: dict, already read sections of file_
+    :param fit_tolerance: Tolerance in mm of B-spline fits, if set splines
+        are created ByPoles from the fitted poles
+    :return: Bool, str
+        True if the swept body has been created and the part saved or
+        False otherwise, and part file name
+    """
+
+    logger = logger or logging.getLogger(__name__)
+    if airfoil is None:
+        airfoil = read_airfoil(file_, sections_cache)
+
+    # Same winding and a start at the leading edge for every section, NX
+    # does not check section directions then
+    sections, reversed_sections = orient_sections(list(airfoil.values()))
+    if reversed_sections.any():
+        logger.info('%d sections of %s have been reversed.', reversed_sections.sum(), file_,
+                    extra={'blade': blade_name(file_), 'operation': 'orient'})
+    airfoil = dict(zip(airfoil, sections))
+
+    # Guides pass through the sections near the leading and trailing edges
+    guide_lines_points, section_help_points, guide_help_points = guide_curves(sections, GUIDE_STATIONS)
+
+    nx_file_name = part_name(file_, prt_dir)
+
+    guides = [f'guide_spline_{i}' for i in range(len(guide_lines_points))]
+
+    # Section curves, guide curves and swept body of the blade part
+    plan = FeaturePlan().part(nx_file_name)
+    for key, val in airfoil.items():
+        plan.spline(key, val, **SECTION_SPLINE, max_deviation=max_deviation, fit_tolerance=fit_tolerance)
+    for guide, point in zip(guides, guide_lines_points):
+        plan.spline(guide, point, **GUIDE_SPLINE, max_deviation=max_deviation, fit_tolerance=fit_tolerance)
+    plan.swept(
+        'blade', sections=list(airfoil), guides=guides,
+        section_help_points=(section_help_points * coeff).tolist(),
+        guide_help_points=(guide_help_points * coeff).tolist(),
+        **SWEPT
+    )
+    plan.close()
+
+    is_built, _ = execute_plan(nx, plan, logger)
+    return is_built, nx_file_name
 
 
-def create_assembly(root_dir, gte_dir, coeff=1):
+def create_assembly(root_dir, gte_dir, coeff=1, use_cache=True, max_deviation=None, profiler=None,
+                    workers=1, retries=1, incremental=True, fit_tolerance=None, load_options=None,
+                    log_mode='file', log_level=logging.WARNING):
 
     """
     Main function for creating NX assembly of flow path compressor or/and turbine
     :param root_dir: Directory in which file will be saved
     :param gte_dir: Directory with compressor/turbine data
     :param coeff: Convert to mm
+    :param use_cache: If parsed airfoil CSV files are kept as binary sidecars
+    :param max_deviation: Chordal tolerance in mm for reducing spline points,
+        None keeps every point
+    :param profiler: NXProfiler, if set NX calls are timed per blade and
+        for the whole run
+    :param workers: Number of NX worker processes building blade parts,
+        1 builds every blade in this process
+    :param retries: Number of rebuilds of a failed blade, used with workers > 1
+    :param incremental: If blade parts built from the same airfoil points and
+        parameters are kept, see prt/build_manifest.json
+    :param fit_tolerance: Tolerance in mm of B-spline fits of blade sections
+        and guides, None sends all points to NX
+    :param load_options: Load options of the assembly components, see
+        NX.set_load_options and ASSEMBLY_LOAD, the session options are
+        restored after the components are added. None loads components
+        fully with the options of the session
+    :param log_mode: 'file' writes nx_logging.log in the calling thread,
+        'queue' writes it from a background thread and 'jsonl' writes
+        structured records to nx_logging.jsonl from a background thread
+    :param log_level: Level of logged records, messages below it are not
+        formatted
     :return: None
     """
 
-    # Logging
+    # Logging, records of the queue modes are written by a background
+    # thread, so a slow drive does not stall the NX build
     log_file = os.path.join(root_dir, 'nx_logging.log')
-    formatter = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    logging.basicConfig(
-        filename=log_file,
-        level=logging.WARNING,
-        format=formatter
-    )
+    pipeline = None
+    if log_mode == 'file':
+        logging.basicConfig(
+            filename=log_file,
+            level=log_level,
+            format=TEXT_FORMAT
+        )
+    else:
+        if log_mode == 'jsonl':
+            log_file = os.path.splitext(log_file)[0] + '.jsonl'
+        pipeline = LogPipeline(log_file, log_level, json_lines=log_mode == 'jsonl').start()
     logger = logging.getLogger(__name__)
 
-    airfoils_dir = os.path.join(gte_dir, 'airfoils')
-    files = CommonClass()
+    try:
 
-    file_exists, airfoil_files = files.get_files(airfoils_dir, ('.csv',))
-    prt_dir = os.path.join(root_dir, 'prt')
-    is_created, create_dir_msg = files.create_dir(prt_dir)
+        airfoils_dir = os.path.join(gte_dir, 'airfoils')
+        files = CommonClass()
+        sections_cache = SectionsCache(enabled=use_cache)
 
-    # Create blade with airfoil points
-    if is_created:
+        # The tree is walked once, later stages refresh changed directories only
+        index = FileIndex(root_dir)
+        file_exists, airfoil_files = index.get_files(airfoils_dir, (BLADE_EXT, '.csv'))
         if file_exists:
-            for file_ in airfoil_files:
-                nx = NX()
-                airfoil = {}
-                with open(file_, newline='') as csv_file:
-                    i = 1
-                    data = csv.reader(csv_file)
-
-                    # Set coordinates dictionary
-                    for row in data:
-                        if f'section{i}' in row[0].split():
-                            key = row[0]
-                            airfoil[key] = []
-                            i += 1
-                        else:
-                            airfoil[key].append([float(coord) for coord in row])
-
-                guide_lines_points = [
-                    [airfoil[k][10] for k in list(airfoil.keys())],
-                    [airfoil[k][int(len(airfoil[k]) / 2 - 10)] for k in list(airfoil.keys())],
-                    [airfoil[k][int(len(airfoil[k]) / 2 + 10)] for k in list(airfoil.keys())]
-                ]
-
-                nx_file_name = f'{os.path.splitext(os.path.split(file_)[1])[0]}.prt'
-                nx_file_name = os.path.join(prt_dir, nx_file_name)
-
-                file_parameters = {'file_name': nx_file_name}
-                is_new_file_created, log_new_file= nx.create_new_nx_file(**file_parameters)
-
-                spline_tags = {}
-                guide_tags = {}
-
-                if is_new_file_created:
-                    # Create section curves
-                    for key, val in airfoil.items():
-                        curve_parameters = {
-                            'points': val,
-                            'degree': 2,
-                            'coeff': 1000,
-                            'closed_spline': True,
-                            'spline_type': 'ThroughPoints',
-                            'matched_knot': True,
-                            'name': key
-                        }
-                        spline_tag, log_spline = nx.create_spline_with_points(**curve_parameters)
-                        if spline_tag:
-                            spline_tags[key] = spline_tag
-                            logger.info(log_spline)
-                        else:
-                            logger.warning(f'{log_spline}. Section {key}')
-
-                    # Create guide curves for swept method
-                    for i, point in enumerate(guide_lines_points):
-                        # Create guide lines
-                        guide_curve_parameters = {
-                            'points': point,
-                            'degree': 2,
-                            'coeff': 1000,
-                            'closed_spline': False,
-                            'spline_type': 'ThroughPoints',
-                            'matched_knot': True,
-                            'name': f'guide_spline_{i}'
-                        }
-                        guide_tag, log_guide_spline = nx.create_spline_with_points(**guide_curve_parameters)
-                        if guide_tag:
-                            guide_tags[i] = guide_tag
-                            logger.info(f'{log_guide_spline}. Guide spline {i}')
-                        else:
-                            logger.warning(f'{log_guide_spline}. Guide spline {i}')
-
-                    parameters_through_curves = {
-                        'sections': spline_tags,
-                        'help_points': [point[0] for point in airfoil.values()],
-                        'surface_type': 'through_curves'
-                    }
-
-                    section_help_points = [[p * coeff for p in point[0]] for point in airfoil.values()]
-                    guide_help_points = [[p * coeff for p in point[0]] for point in guide_lines_points]
-
-                    parameters_swept = {
-                        'sections': spline_tags,
-                        'guides': guide_tags,
-                        'section_help_points': section_help_points,
-                        'guide_help_points': guide_help_points
+            airfoil_files = prefer_binary(airfoil_files)
+        prt_dir = os.path.join(root_dir, 'prt')
+        is_created, create_dir_msg = files.create_dir(prt_dir)
+
+        # One NX wrapper builds every blade and the assembly
+        nx = NX(profiler)
+        parameters = build_parameters(coeff, max_deviation, fit_tolerance)
+
+        # Create blade with airfoil points
+        if is_created:
+            manifest = BuildManifest(prt_dir, enabled=incremental)
+
+            def is_valid(file_, airfoil):
+                # Bad geometry is reported before NX works on the blade
+                is_valid_airfoil, errors, warnings = validate_airfoil(airfoil)
+                extra = {'blade': blade_name(file_), 'operation': 'validate', 'status': is_valid_airfoil}
+                for error in errors:
+                    logger.error("Blade '%s'. %s", file_, error, extra=extra)
+                for warning in warnings:
+                    logger.warning("Blade '%s'. %s", file_, warning, extra=extra)
+                if not is_valid_airfoil:
+                    logger.error("Blade '%s' is skipped.", file_, extra=extra)
+                    manifest.discard(part_name(file_, prt_dir))
+                return is_valid_airfoil
+
+            def is_current(file_, airfoil):
+                part = part_name(file_, prt_dir)
+                digest = manifest.digest(airfoil, parameters)
+                if manifest.is_current(part, digest):
+                    logger.info("File '%s' is up to date.", part,
+                                extra={'blade': blade_name(file_), 'operation': 'manifest', 'status': True})
+                    return True, digest
+                # NX does not create a new part in place of the stale one
+                try:
+                    manifest.discard(part, remove=True)
+                except OSError as ex:
+                    logger.error("File '%s' has not been removed. %s", part, str(ex),
+                                 extra={'blade': blade_name(file_), 'operation': 'manifest', 'status': False})
+                return False, digest
+
+            if file_exists and workers > 1:
+                digests = {}
+                for file_ in airfoil_files:
+                    airfoil = read_airfoil(file_, sections_cache)
+                    if not is_valid(file_, airfoil):
+                        continue
+                    is_up_to_date, digest = is_current(file_, airfoil)
+                    if not is_up_to_date:
+                        digests[file_] = digest
+
+                # Blade parts are independent, they are built by worker
+                # processes and the assembly waits for all of them
+                results = build_blades(
+                    list(digests), prt_dir, workers=workers, retries=retries, coeff=coeff,
+                    use_cache=use_cache, max_deviation=max_deviation, fit_tolerance=fit_tolerance,
+                    profile=profiler is not None, log_level=logger.getEffectiveLevel()
+                )
+                for result in results:
+                    emit_logs(logger, result['logs'])
+                    extra = {
+                        'blade': blade_name(result['file']), 'operation': 'build',
+                        'duration': result['time'], 'status': result['success']
                     }
-
-                    tagged_swept_object, log_swept = nx.swept(**parameters_swept)
-
-                    if tagged_swept_object:
-                        logger.info(f'{log_swept}')
+                    if not result['success']:
+                        logger.error(
+                            "Blade '%s' has failed after %d attempts. %s",
+                            result['file'], result['attempts'], result['message'], extra=extra
+                        )
                     else:
-                        logger.warning(f'{log_swept}')
-
-                else:
-                    logger.warning(log_new_file)
-                is_new_file_closed, log_message = nx.close_all(nx_file_name)
-                if is_new_file_closed:
-                    logger.info(log_message)
-                    del nx
-                else:
-                    logger.error(log_message)
-                    del nx
-    else:
-        logger.critical(create_dir_msg)
-
-    nx = NX()
-
-    assembly_file = os.path.join(root_dir, 'assembly.prt')
-    file_exists, prt_files_root_dir = files.get_files(root_dir, ('.prt',))
-    # If assembly_file exists, set new file name
-    if file_exists and assembly_file in prt_files_root_dir:
-        logger.warning(f"File {assembly_file} exists")
-        assembly_file = files.new_file_name(assembly_file)
-        logger.warning(f"New assembly file name is {assembly_file}")
-
-    # Create new assembly
-    is_success, assembly_msg = nx.create_new_nx_file(file_name=assembly_file)
-    print(is_success, assembly_msg)
-
-    if is_success:
-        file_exists, prt_files = files.get_files(prt_dir, ('.prt',))
-        if file_exists:
-            for part in prt_files:
-                is_part_added, log_msg = nx.add_part_to_assembly(part, assembly_file)
-                if not is_part_added:
-                    logger.error(log_msg)
-
-        # Adding curves to the assembly
-        curves_files_dir = os.path.join(root_dir, 'curves')
-        curves_exists, curves_files = files.get_files(curves_files_dir, ('.csv',))
-        if curves_exists:
-            for curve in curves_files:
-                is_data_obtained, curve_points = files.get_data_from_file(curve)
-
-                if is_data_obtained:
-                    is_spline_added, spline_msg = nx.create_spline_with_points(
-                        curve_points=curve_points, coeff=coeff, closed_spline=False
+                        logger.info("Blade '%s' has been built.", result['file'], extra=extra)
+                        manifest.record(result['part'], digests[result['file']], result['file'])
+                    if profiler:
+                        profiler.records.extend(result['records'])
+            elif file_exists:
+                for file_ in airfoil_files:
+                    airfoil = read_airfoil(file_, sections_cache)
+                    if not is_valid(file_, airfoil):
+                        continue
+                    is_up_to_date, digest = is_current(file_, airfoil)
+                    if is_up_to_date:
+                        continue
+                    if profiler:
+                        profiler.blade = blade_name(file_)
+                    start = time.perf_counter()
+                    is_built, part = build_blade(
+                        nx, file_, prt_dir, coeff, max_deviation, sections_cache, logger, airfoil,
+                        fit_tolerance=fit_tolerance
+                    )
+                    if is_built:
+                        manifest.record(part, digest, file_)
+                    level = logging.INFO if is_built else logging.ERROR
+                    if logger.isEnabledFor(level):
+                        logger.log(
+                            level, "Blade '%s' has been built." if is_built else "Blade '%s' has not been built.",
+                            file_, extra={
+                                'blade': blade_name(file_), 'operation': 'build',
+                                'duration': time.perf_counter() - start, 'status': is_built
+                            }
+                        )
+            manifest.save()
+        else:
+            logger.critical(create_dir_msg)
+
+        if profiler:
+            profiler.blade = None
+
+        assembly_file = os.path.join(root_dir, 'assembly.prt')
+        index.refresh(root_dir)
+        file_exists, prt_files_root_dir = index.get_files(root_dir, ('.prt',))
+        # If assembly_file exists, set new file name
+        if file_exists and assembly_file in prt_files_root_dir:
+            logger.warning("File %s exists", assembly_file)
+            assembly_file = files.new_file_name(assembly_file)
+            logger.warning("New assembly file name is %s", assembly_file)
+
+        # Create new assembly
+        is_success, assembly_msg = nx.create_new_nx_file(file_name=assembly_file)
+        print(is_success, assembly_msg)
+
+        if is_success:
+            file_exists, prt_files = index.get_files(prt_dir, ('.prt',))
+            if file_exists:
+                if load_options is not None:
+                    is_set, load_msg = nx.set_load_options(**load_options)
+                    if is_set:
+                        logger.info(load_msg)
+                    else:
+                        logger.warning(load_msg)
+
+                # Every blade of the row is added in one operation
+                try:
+                    _, added = nx.add_parts_to_assembly(prt_files, assembly_file)
+                finally:
+                    # The options are the ones of the user's session
+                    if load_options is not None:
+                        is_restored, restore_msg = nx.restore_load_options()
+                        logger.log(logging.INFO if is_restored else logging.WARNING, restore_msg)
+                for part, is_part_added, log_msg in added:
+                    logger.log(
+                        logging.INFO if is_part_added else logging.ERROR, log_msg,
+                        extra={'blade': blade_name(part), 'operation': 'add_component', 'status': bool(is_part_added)}
                     )
-                    if not is_spline_added:
-                        logger.error(spline_msg)
 
-        # Trying to save and close the assembly file
-        is_new_file_closed, file_closes_msg = nx.close_all(assembly_file)
-        if is_new_file_closed:
-            logger.info(file_closes_msg)
+            # Adding curves to the assembly
+            curves_files_dir = os.path.join(root_dir, 'curves')
+            curves_exists, curves_files = index.get_files(curves_files_dir, ('.csv',))
+            if curves_exists:
+                for curve in curves_files:
+                    is_data_obtained, curve_points = files.get_data_from_file(curve)
+
+                    if is_data_obtained:
+                        is_spline_added, spline_msg = nx.create_spline_with_points(
+                            points=curve_points, coeff=coeff, closed_spline=False,
+                            max_deviation=max_deviation
+                        )
+                        if not is_spline_added:
+                            logger.error(spline_msg)
+
+            # Trying to save and close the assembly file
+            is_new_file_closed, file_closes_msg = nx.close_all(assembly_file)
+            if is_new_file_closed:
+                logger.info(file_closes_msg)
+            else:
+                logger.error(file_closes_msg)
         else:
-            logger.error(file_closes_msg)
-    else:
-        logger.error(assembly_msg)
+            logger.error(assembly_msg)
+    finally:
+        if pipeline:
+            pipeline.stop()
 
 
 if __name__ == "__main__":
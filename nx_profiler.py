@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import os
+import csv
+import json
+import time
+import functools
+
+# Resident memory is read from /proc on Linux and from psutil elsewhere,
+# psutil is optional
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+# Values passed by value, they are returned as is and their fields
+# are not counted as NX calls
+_PLAIN_TYPES = (bool, int, float, str, bytes, type(None))
+_VALUE_TYPES = ('Point3d', 'Vector3d', 'Matrix3x3')
+
+SUMMARY_FIELDS = ('scope', 'method', 'calls', 'failures', 'time', 'nx_calls', 'items', 'memory')
+
+
+def resident_memory():
+    """
+    :return: int or None
+        Current resident memory of the process in bytes, None if it can
+        not be read
+    """
+
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
+
+
+class NXProfiler:
+    """
+    A class records wall time, NXOpen calls, processed points or
+    sections and success of every NX wrapper method call
+
+    ...
+    Methods
+    -------
+    wrap(obj)
+        Returns a proxy of an NXOpen object that counts calls into NX
+    count(n=1)
+        Counts NX calls made outside of wrapped objects
+    record(method, wall_time, nx_calls, items, success, message, memory)
+        Appends a call record
+    summary()
+        Returns per-blade and per-run totals
+    dump_json(file_name: str)
+        Writes records and summary to a JSON file
+    dump_csv(file_name: str)
+        Writes summary rows to a CSV file
+    """
+
+    def __init__(self):
+        self.records = []
+        self.nx_calls = 0
+        self.blade = None
+
+    def count(self, n=1):
+        self.nx_calls += n
+
+    def wrap(self, obj):
+        if isinstance(obj, _PLAIN_TYPES) or type(obj).__name__ in _VALUE_TYPES:
+            return obj
+        if isinstance(obj, (list, tuple)):
+            return type(obj)(self.wrap(item) for item in obj)
+        if isinstance(obj, _CountingProxy):
+            return obj
+        return _CountingProxy(obj, self)
+
+    def record(self, method, wall_time, nx_calls, items, success, message='', memory=None):
+        self.records.append({
+            'blade': self.blade,
+            'method': method,
+            'time': wall_time,
+            'nx_calls': nx_calls,
+            'items': items,
+            'success': success,
+            'message': message,
+            'memory': memory
+        })
+
+    def summary(self):
+        """
+        :return: dict
+            'blades': blade -> method -> totals and 'run': method -> totals,
+            totals are calls, failures, time, nx_calls, items and
+            the sum of recorded resident memory changes in bytes
+        """
+
+        blades, run = {}, {}
+        for r in self.records:
+            scopes = [run]
+            if r['blade'] is not None:
+                scopes.append(blades.setdefault(r['blade'], {}))
+            for scope in scopes:
+                total = scope.setdefault(r['method'], {
+                    'calls': 0, 'failures': 0, 'time': 0.0, 'nx_calls': 0, 'items': 0, 'memory': None
+                })
+                total['calls'] += 1
+                total['failures'] += not r['success']
+                total['time'] += r['time']
+                total['nx_calls'] += r['nx_calls']
+                total['items'] += r['items'] or 0
+                if r.get('memory') is not None:
+                    total['memory'] = (total['memory'] or 0) + r['memory']
+        return {'blades': blades, 'run': run}
+
+    def dump_json(self, file_name):
+        with open(file_name, 'w') as f:
+            json.dump({'records': self.records, **self.summary()}, f, indent=2)
+
+    def dump_csv(self, file_name):
+        summary = self.summary()
+        scopes = list(summary['blades'].items()) + [('run', summary['run'])]
+        with open(file_name, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+            writer.writeheader()
+            for scope, methods in scopes:
+                for method, total in methods.items():
+                    writer.writerow({'scope': scope, 'method': method, **total})
+
+
+def _unwrap(value):
+    if isinstance(value, _CountingProxy):
+        return object.__getattribute__(value, '_target')
+    if isinstance(value, (list, tuple)):
+        return type(value)(_unwrap(item) for item in value)
+    return value
+
+
+class _CountingProxy:
+    """
+    Forwards every attribute access to an NXOpen object and counts
+    property gets, property sets and method calls
+    """
+
+    __slots__ = ('_target', '_profiler')
+
+    def __init__(self, target, profiler):
+        object.__setattr__(self, '_target', target)
+        object.__setattr__(self, '_profiler', profiler)
+
+    def __getattr__(self, name):
+        value = getattr(self._target, name)
+        profiler = self._profiler
+        if callable(value) and not isinstance(value, type):
+            @functools.wraps(value)
+            def call(*args, **kwargs):
+                profiler.nx_calls += 1
+                args = [_unwrap(a) for a in args]
+                kwargs = {k: _unwrap(v) for k, v in kwargs.items()}
+                return profiler.wrap(value(*args, **kwargs))
+            return call
+        profiler.nx_calls += 1
+        return profiler.wrap(value)
+
+    def __setattr__(self, name, value):
+        self._profiler.nx_calls += 1
+        setattr(self._target, name, _unwrap(value))
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def __eq__(self, other):
+        return self._target == _unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+
+def profiled(items=None):
+    """
+    Decorator of NX methods, records the call if the instance has a profiler
+    :param items: callable(args, kwargs) -> int, number of points or
+        sections processed by the call
+    :return: decorator
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if profiler is None:
+                return method(self, *args, **kwargs)
+
+            calls = profiler.nx_calls
+            start = time.perf_counter()
+            try:
+                result = method(self, *args, **kwargs)
+            except Exception as ex:
+                profiler.record(
+                    method.__name__, time.perf_counter() - start,
+                    profiler.nx_calls - calls, None, False, str(ex)
+                )
+                raise
+            if isinstance(result, tuple) and len(result) == 2:
+                success, message = bool(result[0]), str(result[1])
+            else:
+                success, message = result is not None, str(result or '')
+            profiler.record(
+                method.__name__, time.perf_counter() - start,
+                profiler.nx_calls - calls, items(args, kwargs) if items else None,
+                success, message
+            )
+            return result
+        return wrapper
+    return decorator
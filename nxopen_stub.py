@@ -0,0 +1,835 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import time
+import types
+import itertools
+import functools
+
+from collections import Counter
+
+
+class CallStats:
+    """
+    A class counts calls into the stand-in NXOpen API
+
+    Every method call, property set and property get of an NX object
+    counts as one call and waits for the simulated latency.
+
+    ...
+    Methods
+    -------
+    record(name: str)
+        Counts one call and sleeps latency seconds
+    reset()
+        Drops all counters
+    snapshot()
+        Returns counters as a dictionary
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def record(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def reset(self):
+        self.calls.clear()
+
+    def snapshot(self):
+        return dict(self.calls)
+
+
+STATS = CallStats()
+
+_tags = itertools.count(1000)
+_objects = {}
+
+# Members with these prefixes are methods, everything else is a property
+_METHOD_PREFIXES = (
+    'Add', 'Allow', 'Append', 'Begin', 'Clear', 'Close', 'Commit', 'Create',
+    'Delete', 'Destroy', 'Dispose', 'Do', 'End', 'Establish', 'Evaluate', 'Get',
+    'Hide', 'Remove', 'Reverse', 'Set', 'Show', 'Solve', 'Undo', 'Update'
+)
+
+
+class NXException(Exception):
+    pass
+
+
+def _api(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        STATS.record(f'{self._path}.{method.__name__}')
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _enum(name, *members):
+    return types.SimpleNamespace(**{m: f'{name}.{m}' for m in members})
+
+
+class Point3d:
+
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.X, self.Y, self.Z = float(x), float(y), float(z)
+
+    def __repr__(self):
+        return f'Point3d({self.X}, {self.Y}, {self.Z})'
+
+
+class Vector3d(Point3d):
+
+    def __repr__(self):
+        return f'Vector3d({self.X}, {self.Y}, {self.Z})'
+
+
+class Matrix3x3:
+
+    def __init__(self, *values):
+        names = ('Xx', 'Xy', 'Xz', 'Yx', 'Yy', 'Yz', 'Zx', 'Zy', 'Zz')
+        values = values or (1, 0, 0, 0, 1, 0, 0, 0, 1)
+        for n, v in zip(names, values):
+            setattr(self, n, float(v))
+
+
+class _Node:
+    """
+    A generic NX object: unknown properties are created on first use,
+    unknown methods are accepted and return a new generic object
+    """
+
+    def __init__(self, path):
+        object.__setattr__(self, '_path', path)
+        object.__setattr__(self, '_values', {})
+        object.__setattr__(self, '_children', {})
+
+    def __getattr__(self, name):
+        if name.startswith('_') or not name[:1].isupper():
+            raise AttributeError(name)
+        if name.startswith(_METHOD_PREFIXES) and name not in self._children:
+            return _Call(f'{self._path}.{name}')
+        STATS.record(f'{self._path}.{name}')
+        if name in self._values:
+            return self._values[name]
+        child = self._children.get(name)
+        if child is None:
+            child = self._children[name] = _Node(f'{self._path}.{name}')
+        return child
+
+    def __setattr__(self, name, value):
+        if name.startswith('_') or not name[:1].isupper():
+            object.__setattr__(self, name, value)
+            return
+        STATS.record(f'{self._path}.{name}')
+        self._values[name] = value
+
+
+class _Call:
+
+    def __init__(self, path):
+        self._path = path
+
+    def __call__(self, *args, **kwargs):
+        STATS.record(self._path)
+        return _Node(self._path)
+
+
+class _TaggedObject(_Node):
+
+    def __init__(self, path):
+        super().__init__(path)
+        tag = next(_tags)
+        self._values['Tag'] = tag
+        self._values['Name'] = ''
+        _objects[tag] = self
+
+    @_api
+    def SetName(self, name):
+        self._values['Name'] = name
+
+
+class _List(_Node):
+
+    def __init__(self, path):
+        super().__init__(path)
+        self._items = []
+
+    @_api
+    def Append(self, item):
+        self._items.append(item)
+
+    @_api
+    def Clear(self, *args):
+        self._items.clear()
+
+
+class NXObject(_TaggedObject):
+    Null = None
+
+
+class TaggedObjectManager:
+
+    @staticmethod
+    def GetTaggedObject(tag):
+        STATS.record('TaggedObjectManager.GetTaggedObject')
+        try:
+            return _objects[tag]
+        except KeyError:
+            raise NXException(f'Invalid tag {tag}')
+
+
+class _Status(_Node):
+
+    @_api
+    def Dispose(self):
+        pass
+
+
+class Session(_Node):
+
+    MarkVisibility = _enum('MarkVisibility', 'Visible', 'Invisible')
+
+    _session = None
+
+    def __init__(self):
+        super().__init__('Session')
+        self._children['Parts'] = PartCollection()
+        self._children['DexManager'] = DexManager()
+        self._children['UpdateManager'] = UpdateManager()
+        self._marks = {}
+
+    @staticmethod
+    def GetSession():
+        STATS.record('Session.GetSession')
+        if Session._session is None:
+            Session._session = Session()
+        return Session._session
+
+    @_api
+    def ApplicationSwitchImmediate(self, application):
+        self._values['ApplicationName'] = application
+
+    @_api
+    def SetUndoMark(self, visibility, name):
+        # A mark remembers the features of every open part
+        mark = next(_tags)
+        parts = self._children['Parts']._parts.values()
+        self._marks[mark] = [(part, len(part._features)) for part in parts]
+        return mark
+
+    @_api
+    def UndoToMark(self, mark, name):
+        if mark not in self._marks:
+            raise NXException(f'Invalid undo mark {mark}')
+        for part, count in self._marks[mark]:
+            del part._features[count:]
+
+    @_api
+    def DeleteUndoMark(self, mark, name):
+        self._marks.pop(mark, None)
+
+
+class UpdateManager(_Node):
+
+    def __init__(self):
+        super().__init__('UpdateManager')
+        self._values['InterpartDelay'] = False
+
+    @_api
+    def DoUpdate(self, mark):
+        # Number of update errors
+        return 0
+
+
+class BasePart(_TaggedObject):
+
+    Null = None
+    SaveComponents = _enum('SaveComponents', 'TrueValue', 'FalseValue')
+    CloseAfterSave = _enum('CloseAfterSave', 'TrueValue', 'FalseValue')
+    CloseModified = _enum('CloseModified', 'CloseModified', 'DontCloseModified', 'UseResponses')
+    CloseWholeTree = _enum('CloseWholeTree', 'TrueValue', 'FalseValue')
+
+    stub_format = 'nxopen-stub-part'
+
+    def __init__(self, file_name, path='Part'):
+        super().__init__(path)
+        self._values['FullPath'] = file_name
+        self._values['Leaf'] = os.path.splitext(os.path.split(file_name)[1])[0]
+        self._collection = None
+        self._features = []
+        self._components = []
+        self._children['Features'] = FeatureCollection(self)
+        self._children['Points'] = PointCollection()
+        self._children['Sections'] = SectionCollection()
+        self._children['ScRuleFactory'] = ScRuleFactory()
+        self._children['AssemblyManager'] = AssemblyManager(self)
+
+        # Default modeling tolerances of the metric template
+        preferences = self._children['Preferences'] = _Node('PartPreferences')
+        modeling = preferences._children['Modeling'] = _Node('PartPreferences.Modeling')
+        modeling._values.update(DistanceToleranceData=0.01, AngleToleranceData=0.5)
+
+    def _write(self):
+        file_name = self._values['FullPath']
+        if os.path.dirname(file_name):
+            os.makedirs(os.path.dirname(file_name), exist_ok=True)
+        with open(file_name, 'w') as f:
+            json.dump({
+                'format': self.stub_format,
+                'name': self._values['Leaf'],
+                'features': [feature._path for feature in self._features],
+                'components': self._components
+            }, f)
+
+    @_api
+    def Save(self, save_components, close_after_save):
+        self._write()
+        return _Status('PartSaveStatus')
+
+    @_api
+    def SaveAs(self, file_name):
+        self._values['FullPath'] = file_name
+        self._write()
+        return _Status('PartSaveStatus')
+
+    @_api
+    def AssignPermanentName(self, file_name):
+        self._values['FullPath'] = file_name
+
+    @_api
+    def Close(self, close_whole_tree, close_modified, responses):
+        if self._collection is not None:
+            self._collection._remove(self)
+
+
+class Part(BasePart):
+
+    Units = _enum('Units', 'Millimeters', 'Inches')
+
+
+FileNewTemplateType = _enum('FileNewTemplateType', 'Item', 'Specification', 'Master')
+
+
+class PartCollection(_Node):
+
+    def __init__(self):
+        super().__init__('PartCollection')
+        self._values['Work'] = Part.Null
+        self._children['LoadOptions'] = LoadOptions()
+        self._parts = {}
+
+    def _add(self, part, work=True):
+        self._parts[os.path.normcase(part._values['FullPath'])] = part
+        part._collection = self
+        if work:
+            self._values['Work'] = part
+
+    def _remove(self, part):
+        for key in [k for k, p in self._parts.items() if p is part]:
+            del self._parts[key]
+        if self._values['Work'] is part:
+            self._values['Work'] = Part.Null
+
+    def _open(self, file_name):
+        key = os.path.normcase(file_name)
+        if key in self._parts:
+            return self._parts[key]
+        if not os.path.isfile(file_name):
+            raise NXException(f"File '{file_name}' not found")
+        part = Part(file_name)
+        self._add(part, work=False)
+        return part
+
+    @_api
+    def FileNew(self):
+        return FileNew(self)
+
+    @_api
+    def Open(self, file_name):
+        return self._open(file_name), _Status('PartLoadStatus')
+
+    @_api
+    def OpenBase(self, file_name):
+        return self._open(file_name), _Status('PartLoadStatus')
+
+    @_api
+    def CloseAll(self, close_modified, responses):
+        self._parts.clear()
+        self._values['Work'] = Part.Null
+
+
+class LoadOptions(_Node):
+
+    def __init__(self):
+        super().__init__('LoadOptions')
+        self._values['UsePartialLoading'] = False
+        self._values['UseLightweightRepresentations'] = False
+        self._reference_sets = ['MODEL', 'Entire Part']
+
+    @_api
+    def GetDefaultReferenceSets(self):
+        return list(self._reference_sets)
+
+    @_api
+    def SetDefaultReferenceSets(self, reference_sets):
+        self._reference_sets = list(reference_sets)
+
+
+class FileNew(_Node):
+
+    def __init__(self, parts):
+        super().__init__('FileNew')
+        self._parts = parts
+        self._destroyed = False
+
+    @_api
+    def SetCanCreateAltrep(self, value):
+        pass
+
+    @_api
+    def Commit(self):
+        if self._destroyed:
+            raise NXException('FileNew object has been destroyed')
+        file_name = self._values.get('NewFileName')
+        if not file_name:
+            raise NXException('New file name is not set')
+        if os.path.exists(file_name):
+            # As NX, a new part is not created in place of an existing file
+            raise NXException(f"File '{file_name}' already exists")
+        if os.path.normcase(file_name) in self._parts._parts:
+            raise NXException(f"Part '{file_name}' is already loaded")
+        part = Part(file_name)
+        self._parts._add(part)
+        return part
+
+    @_api
+    def Destroy(self):
+        self._destroyed = True
+
+
+class FeatureCollection(_Node):
+
+    def __init__(self, part):
+        super().__init__('FeatureCollection')
+        self._part = part
+
+    @_api
+    def CreateStudioSplineBuilderEx(self, spline):
+        return Features.StudioSplineBuilderEx(self._part)
+
+    @_api
+    def CreateThroughCurvesBuilder(self, feature):
+        return Features.ThroughCurvesBuilder(self._part)
+
+    @_api
+    def CreateStudioSurfaceBuilder(self, feature):
+        return Features.ThroughCurvesBuilder(self._part, 'StudioSurfaceBuilder')
+
+    @_api
+    def CreateSweptBuilder(self, feature):
+        return Features.SweptBuilder(self._part)
+
+
+class Point(_TaggedObject):
+
+    def __init__(self, coordinates):
+        super().__init__('Point')
+        self._values['Coordinates'] = coordinates
+
+
+class PointCollection(_Node):
+
+    def __init__(self):
+        super().__init__('PointCollection')
+
+    @_api
+    def CreatePoint(self, coordinates):
+        return Point(coordinates)
+
+
+class Spline(_TaggedObject):
+
+    def __init__(self, points, closed):
+        super().__init__('Spline')
+        self._points = points
+        self._closed = closed
+
+
+class ScRuleFactory(_Node):
+
+    def __init__(self):
+        super().__init__('ScRuleFactory')
+
+    @_api
+    def CreateRuleCurveFeature(self, features):
+        return _Node('CurveFeatureRule')
+
+
+class Section(_TaggedObject):
+
+    Null = None
+    AllowTypes = _enum('AllowTypes', 'OnlyCurves', 'CurvesAndPoints')
+    Mode = _enum('Mode', 'Create', 'Edit')
+
+    def __init__(self):
+        super().__init__('Section')
+        self._curves = []
+        self._reversed = False
+
+    @_api
+    def AllowSelfIntersection(self, value):
+        pass
+
+    @_api
+    def SetAllowedEntityTypes(self, value):
+        pass
+
+    @_api
+    def AddToSection(self, rules, curve, start, end, help_point, mode, chain):
+        self._curves.append(curve)
+        self._help_point = help_point
+
+    @_api
+    def GetStartAndDirection(self):
+        points = self._curves[0]._points if self._curves else []
+        if len(points) < 2:
+            raise NXException('Section has no curves')
+        start, end = (points[-1], points[-2]) if self._reversed else (points[0], points[1])
+        direction = Vector3d(end.X - start.X, end.Y - start.Y, end.Z - start.Z)
+        return start, self._help_point, direction
+
+    @_api
+    def ReverseDirection(self):
+        self._reversed = not self._reversed
+
+
+class SectionCollection(_Node):
+
+    def __init__(self):
+        super().__init__('SectionCollection')
+
+    @_api
+    def CreateSection(self, chaining_tolerance, distance_tolerance, angle_tolerance):
+        return Section()
+
+
+class AssemblyManager(_Node):
+
+    def __init__(self, part):
+        super().__init__('AssemblyManager')
+        self._part = part
+
+    @_api
+    def CreateAddComponentBuilder(self):
+        return Assemblies.AddComponentBuilder(self._part)
+
+
+class IgesImporter(_Node):
+
+    CopiousDataEnum = _enum('CopiousDataEnum', 'LinearNURBSpline', 'Polyline', 'Ignore')
+
+    def __init__(self):
+        super().__init__('IgesImporter')
+        self._committed = False
+
+    @_api
+    def Commit(self):
+        # Like NX, an importer is committed once and destroyed after that
+        if self._committed:
+            raise NXException('Importer has already been committed')
+        self._committed = True
+        in_file = self._values.get('InputFile')
+        out_file = self._values.get('OutputFile')
+        if not in_file or not os.path.isfile(in_file):
+            raise NXException(f"Input file '{in_file}' not found")
+        if not out_file:
+            raise NXException('Output file is not set')
+        Part(out_file)._write()
+        return NXObject('IgesImport')
+
+    @_api
+    def Destroy(self):
+        pass
+
+
+class DexManager(_Node):
+
+    def __init__(self):
+        super().__init__('DexManager')
+
+    @_api
+    def CreateIgesImporter(self):
+        return IgesImporter()
+
+
+class Feature(_TaggedObject):
+
+    Null = None
+
+    def __init__(self, path, entities=()):
+        super().__init__(path)
+        self._entities = list(entities)
+
+    @_api
+    def GetEntities(self):
+        return list(self._entities)
+
+    @_api
+    def HideParents(self):
+        pass
+
+
+class _Builder(_Node):
+
+    def __init__(self, part, path):
+        super().__init__(path)
+        self._part = part
+        self._destroyed = False
+
+    def _check(self):
+        if self._destroyed:
+            raise NXException(f'{self._path} has been destroyed')
+
+    def _feature(self, path, entities=()):
+        feature = Feature(path, entities)
+        self._part._features.append(feature)
+        return feature
+
+    @_api
+    def Destroy(self):
+        self._destroyed = True
+
+
+class _GeometricConstraintDataManager(_List):
+
+    def __init__(self):
+        super().__init__('GeometricConstraintDataManager')
+
+    @_api
+    def CreateGeometricConstraintData(self):
+        return _Node('GeometricConstraintData')
+
+
+class StudioSplineBuilderEx(_Builder):
+
+    MatchKnotsTypes = _enum('MatchKnotsTypes', 'NotSet', 'Cubic', 'General')
+    Types = _enum('Types', 'ThroughPoints', 'ByPoles', 'NotSet')
+
+    def __init__(self, part):
+        super().__init__(part, 'StudioSplineBuilderEx')
+        self._values.update(
+            Degree=3, IsPeriodic=False,
+            Type=self.Types.ThroughPoints, MatchKnotsType=self.MatchKnotsTypes.NotSet
+        )
+        self._children['ConstraintManager'] = _GeometricConstraintDataManager()
+
+    @_api
+    def Commit(self):
+        self._check()
+        data = self._children['ConstraintManager']._items
+        points = [d._values['Point']._values['Coordinates'] for d in data]
+        degree = self._values['Degree']
+        if self._values['Type'] == self.Types.NotSet:
+            raise NXException('Spline type is not set')
+        if len(points) < degree + 1:
+            raise NXException(f'{len(points)} points are not enough for degree {degree}')
+        for a, b in zip(points[:-1], points[1:]):
+            if (a.X, a.Y, a.Z) == (b.X, b.Y, b.Z):
+                raise NXException('Coincident consecutive points')
+        spline = Spline(points, self._values['IsPeriodic'])
+        return self._feature('StudioSpline', (spline,))
+
+
+class ThroughCurvesBuilder(_Builder):
+
+    PatchTypes = _enum('PatchTypes', 'Single', 'Multiple')
+
+    def __init__(self, part, path='ThroughCurvesBuilder'):
+        super().__init__(part, path)
+        self._children['SectionsList'] = _List(f'{path}.SectionsList')
+
+    @_api
+    def CommitFeature(self):
+        self._check()
+        if len(self._children['SectionsList']._items) < 2:
+            raise NXException('At least two sections are required')
+        return self._feature('ThroughCurves')
+
+
+class Swept(Feature):
+    Null = None
+
+
+class SweptBuilder(_Builder):
+
+    def __init__(self, part):
+        super().__init__(part, 'SweptBuilder')
+        self._children['SectionList'] = _List('SweptBuilder.SectionList')
+        self._children['GuideList'] = _List('SweptBuilder.GuideList')
+
+    @_api
+    def Commit(self):
+        self._check()
+        if not self._children['SectionList']._items:
+            raise NXException('No section curves')
+        if not 1 <= len(self._children['GuideList']._items) <= 3:
+            raise NXException('One to three guide curves are required')
+        return self._feature('Swept')
+
+
+class AddComponentBuilder(_Builder):
+
+    LocationType = _enum('LocationType', 'WorkPartAbsolute', 'Snap', 'Absolute')
+
+    def __init__(self, part):
+        super().__init__(part, 'AddComponentBuilder')
+        self._parts_to_add = []
+
+    @_api
+    def SetInitialLocationType(self, location_type):
+        pass
+
+    @_api
+    def SetInitialLocationAndOrientation(self, point, orientation):
+        pass
+
+    @_api
+    def SetComponentAnchor(self, anchor):
+        pass
+
+    @_api
+    def SetPartsToAdd(self, parts):
+        self._parts_to_add = list(parts)
+
+    @_api
+    def Commit(self):
+        self._check()
+        if not self._parts_to_add:
+            raise NXException('No parts to add')
+        self._part._components.extend(p._values['FullPath'] for p in self._parts_to_add)
+        return NXObject('Component')
+
+
+class UFDisp(_Node):
+
+    def __init__(self):
+        super().__init__('UFDisp')
+        self._display = 0
+
+    @_api
+    def SetDisplay(self, display):
+        self._display = display
+
+    @_api
+    def RegenerateDisplay(self):
+        pass
+
+
+class UFSession(_Node):
+
+    _session = None
+
+    def __init__(self):
+        super().__init__('UFSession')
+        self._children['Disp'] = UFDisp()
+
+    @staticmethod
+    def GetUFSession():
+        STATS.record('UFSession.GetUFSession')
+        if UFSession._session is None:
+            UFSession._session = UFSession()
+        return UFSession._session
+
+
+UFConstants = types.SimpleNamespace(UF_DISP_UNSUPPRESS_DISPLAY=0, UF_DISP_SUPPRESS_DISPLAY=1)
+
+
+class ProductInterface:
+    InterfaceObject = types.SimpleNamespace(Null=None)
+
+
+class ScalingMethodBuilder:
+    ScalingOptions = _enum('ScalingOptions', 'Constant', 'Blending', 'Uniform', 'Lateral')
+
+
+Features = types.SimpleNamespace(
+    Feature=Feature, Swept=Swept, StudioSplineBuilderEx=StudioSplineBuilderEx,
+    ThroughCurvesBuilder=ThroughCurvesBuilder, SweptBuilder=SweptBuilder
+)
+Assemblies = types.SimpleNamespace(
+    AddComponentBuilder=AddComponentBuilder, ProductInterface=ProductInterface
+)
+GeometricUtilities = types.SimpleNamespace(ScalingMethodBuilder=ScalingMethodBuilder)
+UF = types.SimpleNamespace(UFSession=UFSession, UFConstants=UFConstants)
+
+
+def _module(name, namespace):
+    module = types.ModuleType(name)
+    module.__dict__.update(namespace)
+    module.__path__ = []
+    return module
+
+
+def _build_modules():
+    features = _module('NXOpen.Features', vars(Features))
+    assemblies = _module('NXOpen.Assemblies', vars(Assemblies))
+    geometric_utilities = _module('NXOpen.GeometricUtilities', vars(GeometricUtilities))
+    uf = _module('NXOpen.UF', vars(UF))
+    nxopen = _module('NXOpen', {
+        'IS_STUB': True,
+        'Session': Session, 'NXException': NXException, 'NXObject': NXObject,
+        'TaggedObjectManager': TaggedObjectManager, 'Point3d': Point3d,
+        'Vector3d': Vector3d, 'Matrix3x3': Matrix3x3, 'BasePart': BasePart,
+        'Part': Part, 'FileNewTemplateType': FileNewTemplateType,
+        'IgesImporter': IgesImporter, 'Section': Section,
+        'SectionCollection': SectionCollection, 'Features': features,
+        'Assemblies': assemblies, 'GeometricUtilities': geometric_utilities, 'UF': uf
+    })
+    return {
+        'NXOpen': nxopen, 'NXOpen.Features': features,
+        'NXOpen.Assemblies': assemblies, 'NXOpen.GeometricUtilities': geometric_utilities,
+        'NXOpen.UF': uf
+    }
+
+
+def install(latency=0.0):
+    """
+    Registers the stand-in as the NXOpen package, it has to be called
+    before nx_class is imported
+    :param latency: float, simulated duration of every API call in seconds
+    :return: CallStats
+    """
+
+    current = sys.modules.get('NXOpen')
+    if current is not None and not getattr(current, 'IS_STUB', False):
+        raise RuntimeError('The real NXOpen package has already been imported.')
+    if current is None:
+        sys.modules.update(_build_modules())
+    STATS.latency = latency
+    return STATS
+
+
+def is_installed():
+    return getattr(sys.modules.get('NXOpen'), 'IS_STUB', False)
+
+
+def reset():
+    """
+    Drops the session, all open parts and counters
+    :return: None
+    """
+
+    Session._session = None
+    UFSession._session = None
+    _objects.clear()
+    STATS.reset()
@@ -0,0 +1,290 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+
+def bspline_knots(n_poles, degree, closed=False):
+    """
+    Uniform knot vector of a spline defined by poles
+    :param n_poles: int, number of poles
+    :param degree: int
+    :param closed: bool, periodic spline if True, clamped otherwise
+    :return: np.ndarray
+        Knots on the parameter range [0, 1], a periodic spline has
+        n_poles + 2 * degree + 1 knots and uses its first degree poles
+        again after the last one
+    """
+
+    if closed:
+        return (np.arange(n_poles + 2 * degree + 1) - degree) / n_poles
+    inner = np.linspace(0.0, 1.0, n_poles - degree + 1)
+    return np.concatenate((np.zeros(degree), inner, np.ones(degree)))
+
+
+def bspline_basis(knots, degree, u):
+    """
+    Values of every basis function at every parameter
+    :param knots: np.ndarray, knot vector
+    :param degree: int
+    :param u: np.ndarray, parameters within [knots[degree], knots[-degree - 1]]
+    :return: np.ndarray, (len(u), len(knots) - degree - 1) matrix
+    """
+
+    u = np.asarray(u, dtype=float)
+    n = len(knots) - degree - 1
+    span = np.clip(np.searchsorted(knots, u, side='right') - 1, degree, n - 1)
+
+    # Nonzero functions of every span, the triangular scheme runs
+    # on all parameters at once
+    values = np.zeros((len(u), degree + 1))
+    values[:, 0] = 1.0
+    left = np.zeros((len(u), degree + 1))
+    right = np.zeros((len(u), degree + 1))
+    for j in range(1, degree + 1):
+        left[:, j] = u - knots[span + 1 - j]
+        right[:, j] = knots[span + j] - u
+        saved = np.zeros(len(u))
+        for r in range(j):
+            temp = values[:, r] / (right[:, r + 1] + left[:, j - r])
+            values[:, r] = saved + right[:, r + 1] * temp
+            saved = left[:, j - r] * temp
+        values[:, j] = saved
+
+    basis = np.zeros((len(u), n))
+    rows = np.arange(len(u))[:, None]
+    basis[rows, span[:, None] - degree + np.arange(degree + 1)] = values
+    return basis
+
+
+def _design_matrix(n_poles, degree, closed, u):
+    knots = bspline_knots(n_poles, degree, closed)
+    basis = bspline_basis(knots, degree, u)
+    if closed:
+        # Functions of the repeated poles belong to the first ones
+        basis[:, :degree] += basis[:, n_poles:]
+        basis = basis[:, :n_poles]
+    return basis
+
+
+def evaluate_bspline(poles, degree, u, closed=False, derivative=False):
+    """
+    :param poles: (N, 3) array
+    :param degree: int
+    :param u: parameters on [0, 1], wrapped for a periodic spline
+    :param closed: bool, periodic spline if True
+    :param derivative: bool, if first derivatives are returned as well
+    :return: np.ndarray or (np.ndarray, np.ndarray)
+        Points (len(u), 3) and their first derivatives
+    """
+
+    poles = np.asarray(poles, dtype=float)
+    u = np.asarray(u, dtype=float)
+    if closed:
+        u = np.mod(u, 1.0)
+        poles = np.vstack((poles, poles[:degree]))
+    knots = bspline_knots(len(poles) - degree if closed else len(poles), degree, closed)
+    points = bspline_basis(knots, degree, u) @ poles
+    if not derivative:
+        return points
+
+    # Derivative is a spline of degree - 1 on the inner knots
+    scale = degree / (knots[degree + 1:degree + len(poles)] - knots[1:len(poles)])
+    derivative_poles = scale[:, None] * np.diff(poles, axis=0)
+    return points, bspline_basis(knots[1:-1], degree - 1, u) @ derivative_poles
+
+
+def _chord_parameters(points, closed):
+    steps = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    if closed:
+        steps = np.append(steps, np.linalg.norm(points[0] - points[-1]))
+    length = np.concatenate(([0.0], np.cumsum(steps)))
+    if length[-1] == 0:
+        raise ValueError('All points are coincident.')
+    return length[:len(points)] / length[-1]
+
+
+def _averaged_parameters(chord, n_spans, closed):
+    """
+    Parameters of the points on the uniform knots of a ByPoles spline
+
+    Knots are placed by averaging, every span holds the same number of
+    points, so spans are short where the points are dense, as at the
+    leading and trailing edges. A ByPoles spline only carries uniform
+    knots, the point parameters are mapped instead, piecewise linearly
+    from the averaged knots on chord length parameters to the uniform ones.
+    :param chord: np.ndarray, chord length parameters of the points
+    :param n_spans: int, number of knot spans
+    :param closed: bool, periodic spline if True
+    :return: np.ndarray
+    """
+
+    # Chord parameter at every knot, a knot between two points is
+    # placed proportionally to its fractional point index
+    if closed:
+        chord_ext = np.append(chord, 1.0)
+        index = np.arange(n_spans + 1) * (len(chord) / n_spans)
+    else:
+        chord_ext = chord
+        index = np.arange(n_spans + 1) * ((len(chord) - 1) / n_spans)
+    knots = np.interp(index, np.arange(len(chord_ext)), chord_ext)
+    return np.interp(chord, knots, np.linspace(0.0, 1.0, n_spans + 1))
+
+
+def interpolate_bspline(points, degree=3, closed=False):
+    """
+    Interpolating B-spline through a point array, a model of a
+    ThroughPoints studio spline with knots matched to the points
+    :param points: (N, 3) array, a closed section is given without
+        repeating its first point
+    :param degree: int, spline degree
+    :param closed: bool, periodic spline if True, otherwise the spline
+        is clamped with knots placed by averaging
+    :return: np.ndarray, np.ndarray, np.ndarray
+        Knots, poles and chord length parameters of the points, a
+        periodic spline repeats its first degree poles after the last one
+        and is evaluated by bspline_basis(knots, degree, u) @ poles for u
+        on [0, 1]
+    """
+
+    points = np.asarray(points, dtype=float)
+    if closed and len(points) > 1 and np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    n = len(points)
+    if n <= degree:
+        raise ValueError(f'{n} points are not enough for degree {degree}.')
+
+    u = _chord_parameters(points, closed)
+    if closed:
+        # Knots at the points, a spline of even degree passes through
+        # them in the middle of its spans
+        breaks = np.append(u, 1.0)
+        if degree % 2 == 0:
+            u = 0.5 * (breaks[:-1] + breaks[1:])
+        knots = np.concatenate((breaks[n - degree:n] - 1.0, breaks, breaks[1:degree + 1] + 1.0))
+        basis = bspline_basis(knots, degree, u)
+        basis[:, :degree] += basis[:, n:]
+        poles = np.linalg.solve(basis[:, :n], points)
+        return knots, np.vstack((poles, poles[:degree])), u
+
+    inner = np.convolve(u, np.ones(degree) / degree, mode='valid')[1:-1]
+    knots = np.concatenate((np.zeros(degree + 1), inner, np.ones(degree + 1)))
+    return knots, np.linalg.solve(bspline_basis(knots, degree, u), points), u
+
+
+def _project(points, poles, degree, closed, u, steps):
+    """
+    Moves every parameter toward the foot of the perpendicular from its
+    point to the spline
+    :return: np.ndarray, np.ndarray
+        Parameters and distances from the points to the spline at them,
+        the smallest distance found for every point, so never less than
+        the true distance
+    """
+
+    # A step never passes more than half of a knot span
+    h = 0.5 / (len(poles) if closed else len(poles) - degree)
+    best_u, best = u, np.full(len(points), np.inf)
+    for k in range(steps + 1):
+        curve, tangent = evaluate_bspline(poles, degree, u, closed, derivative=True)
+        error = curve - points
+        distance = np.sqrt(np.einsum('ij,ij->i', error, error))
+        better = distance < best
+        best_u, best = np.where(better, u, best_u), np.where(better, distance, best)
+        if k == steps:
+            break
+
+        step = np.einsum('ij,ij->i', error, tangent) / np.maximum(np.einsum('ij,ij->i', tangent, tangent), 1e-300)
+        u = best_u - np.clip(step, -h, h)
+        if closed:
+            u = np.mod(u, 1.0)
+        else:
+            u = np.clip(u, 0.0, 1.0)
+            u[0], u[-1] = 0.0, 1.0
+    return best_u, best
+
+
+def _least_squares(basis, rhs):
+    # Normal equations are banded and well posed while every knot span
+    # holds a point, SVD is the fallback
+    try:
+        return np.linalg.solve(basis.T @ basis, basis.T @ rhs)
+    except np.linalg.LinAlgError:
+        return np.linalg.lstsq(basis, rhs, rcond=None)[0]
+
+
+def _fit(points, degree, closed, n_poles, iterations):
+    u = _averaged_parameters(_chord_parameters(points, closed), n_poles if closed else n_poles - degree, closed)
+    for i in range(iterations + 1):
+        basis = _design_matrix(n_poles, degree, closed, u)
+        if closed:
+            poles = _least_squares(basis, points)
+        else:
+            # End poles are the end points, the spline passes through them
+            poles = np.empty((n_poles, points.shape[1]))
+            poles[0], poles[-1] = points[0], points[-1]
+            rhs = points - np.outer(basis[:, 0], points[0]) - np.outer(basis[:, -1], points[-1])
+            if n_poles > 2:
+                poles[1:-1] = _least_squares(basis[:, 1:-1], rhs)
+
+        # Corrected parameters are used by the next fit
+        u, distance = _project(points, poles, degree, closed, u, 1 if i < iterations else 4)
+
+    return poles, float(distance.max())
+
+
+def fit_bspline(points, degree=3, closed=False, n_poles=None, tolerance=None, iterations=2):
+    """
+    Least-squares B-spline with uniform knots through a point array,
+    the knots a ByPoles studio spline is created with
+    :param points: (N, 3) array, a closed section is given without
+        repeating its first point
+    :param degree: int, spline degree
+    :param closed: bool, periodic spline if True, otherwise the spline
+        is clamped and passes through the end points
+    :param n_poles: int, number of poles, used if tolerance is not set
+    :param tolerance: float, largest allowed deviation, the smallest
+        found number of poles within it is used, if it can not be
+        reached the fit with most poles is returned
+    :param iterations: int, parameter corrections after the first fit
+    :return: np.ndarray, float
+        Poles and the largest distance of a point to the spline, the
+        distance is measured at the point parameter, so it is never less
+        than the true distance
+
+    Knots are placed by averaging, see _averaged_parameters, so every
+    knot span holds a point and the number of poles is limited by the
+    number of points only.
+    """
+
+    points = np.asarray(points, dtype=float)
+    if closed and len(points) > 1 and np.array_equal(points[0], points[-1]):
+        points = points[:-1]
+    min_poles = degree + 1
+    if len(points) < min_poles:
+        raise ValueError(f'{len(points)} points are not enough for degree {degree}.')
+    max_poles = len(points)
+
+    if tolerance is None:
+        n_poles = min_poles if n_poles is None else n_poles
+        if not min_poles <= n_poles <= max_poles:
+            raise ValueError(f'Number of poles has to be within {min_poles}..{max_poles}.')
+        return _fit(points, degree, closed, n_poles, iterations)
+
+    # Pole count is doubled until the fit is within tolerance and then
+    # bisected between the last failed and the first passed counts
+    failed, n = min_poles - 1, min(max(min_poles, 2 * degree), max_poles)
+    fits = {}
+    while True:
+        fits[n] = _fit(points, degree, closed, n, iterations)
+        if fits[n][1] <= tolerance or n == max_poles:
+            break
+        failed, n = n, min(2 * n, max_poles)
+    passed = n
+    while passed - failed > 1:
+        n = (passed + failed) // 2
+        fits[n] = _fit(points, degree, closed, n, iterations)
+        if fits[n][1] <= tolerance:
+            passed = n
+        else:
+            failed = n
+    return fits[passed]